@@ -0,0 +1,107 @@
+# analytics.py
+import threading
+
+import pandas as pd
+import streamlit as st
+
+from theater_rows import EXPECTED_HEADERS as THEATER_HEADERS, MONTH_NUMBERS_ID
+from tracing import traced
+
+# Rows of the unit-song table shown by the dashboard
+TOP_UNIT_SONGS = 20
+
+
+# Function to build a frame from the rows of a RowStore starting at `start`; the store is
+# columnar, so each column is handed to pandas as one list
+def store_frame(data, start=0):
+    return pd.DataFrame({header: data.column(i)[start:] for i, header in enumerate(data.headers)})
+
+# Function to aggregate theater rows: shows per (month, setlist) and unit-song frequency.
+# Tanggal is DD/MM/YYYY; the unit songs of a show are one per line ("- Song"). Dates and
+# song lists repeat across shows, so each distinct value is parsed once and the results
+# are spread back (dates) or weighted by how often the value occurs (song lists).
+@traced("aggregate_theater")
+def aggregate_theater(frame):
+    codes, dates = pd.factorize(frame['Tanggal'])
+    month_labels = pd.to_datetime(pd.Series(dates), format="%d/%m/%Y", errors='coerce').dt.strftime('%Y-%m')
+    months = pd.Series(month_labels.to_numpy()[codes], index=frame.index, name='Month')
+
+    song_lists = frame['Unit Song'].value_counts()
+    songs = song_lists.index.to_series().str.split('\n').explode().str.strip().str.lstrip('-').str.strip()
+    weights = song_lists.reindex(songs.index).to_numpy()
+    unit_songs = pd.Series(weights, index=songs.to_numpy())[songs.to_numpy() != ''].groupby(level=0).sum()
+    return {
+        'shows_per_setlist': frame.groupby([months, frame['Setlist']]).size(),
+        'unit_songs': unit_songs.sort_values(ascending=False)
+    }
+
+# Function to aggregate Video Call rows: sessions per event, per time slot and per month.
+# Tanggal is formatted as "1, Februari 2025".
+@traced("aggregate_video_call")
+def aggregate_video_call(frame):
+    parts = frame['Tanggal'].str.extract(r',\s*(\w+)\s+(\d{4})$')
+    month_numbers = parts[0].map(MONTH_NUMBERS_ID)
+    months = parts[1] + '-' + month_numbers.map('{:02.0f}'.format, na_action='ignore')
+    return {
+        'sessions_per_event': frame['Nama Event'].value_counts(),
+        'time_slots': frame['Waktu'].value_counts(),
+        'sessions_per_month': months.dropna().value_counts().sort_index()
+    }
+
+# Function to add the tables aggregated over new rows to the running totals
+def merge_tables(tables, new_tables):
+    return {name: table.add(new_tables[name], fill_value=0).astype('int64') for name, table in tables.items()}
+
+
+# Keeps the aggregate tables of every tab up to date. Snapshots refreshed with new bottom
+# rows or written locally extend a copy of the previous row store, so when a tab's store
+# shares the lineage of the one aggregated last, only the rows past the aggregated count
+# are aggregated and added to the totals; any other store (a full read) is aggregated anew.
+class AnalyticsCache:
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    # Function to get the aggregate tables of a tab's rows (a RowStore)
+    def tables(self, spreadsheet_id, sheet_title, data, aggregate):
+        key = (spreadsheet_id, sheet_title)
+        with self._lock:
+            state = self._states.get(key)
+        if state is not None and state['lineage'] is data.lineage and state['rows'] <= len(data):
+            if state['rows'] == len(data):
+                return state['tables']
+            tables = merge_tables(state['tables'], aggregate(store_frame(data, state['rows'])))
+        else:
+            tables = aggregate(store_frame(data))
+        with self._lock:
+            self._states[key] = {'lineage': data.lineage, 'rows': len(data), 'tables': tables}
+        return tables
+
+
+# Process-wide tables shared by every Streamlit session
+analytics_cache = AnalyticsCache()
+
+
+# Function to render the analytics view of the selected sheet
+def analytics_dashboard(spreadsheet_id, sheet_title, headers, data):
+    with st.expander(f"Analytics for {sheet_title}"):
+        if not len(data):
+            st.info("No rows to analyse yet.")
+            return
+
+        if headers == THEATER_HEADERS:
+            tables = analytics_cache.tables(spreadsheet_id, sheet_title, data, aggregate_theater)
+            st.markdown("**Shows per setlist per month**")
+            per_month = tables['shows_per_setlist'].unstack(fill_value=0)
+            st.bar_chart(per_month)
+            st.dataframe(per_month, use_container_width=True)
+            st.markdown(f"**Most performed unit songs** (top {TOP_UNIT_SONGS})")
+            st.dataframe(tables['unit_songs'].nlargest(TOP_UNIT_SONGS).rename('Shows'), use_container_width=True)
+        else:
+            tables = analytics_cache.tables(spreadsheet_id, sheet_title, data, aggregate_video_call)
+            st.markdown("**Sessions per event**")
+            st.bar_chart(tables['sessions_per_event'].rename('Sessions'))
+            st.markdown("**Time slot usage**")
+            st.bar_chart(tables['time_slots'].rename('Sessions'))
+            st.markdown("**Sessions per month**")
+            st.bar_chart(tables['sessions_per_month'].sort_index().rename('Sessions'))
@@ -0,0 +1,180 @@
+# api_scheduler.py
+import json
+import os
+import random
+import threading
+import time
+from itertools import count
+
+from googleapiclient.errors import HttpError
+
+from tracing import tracer
+
+READ = "read"
+WRITE = "write"
+
+# Lower runs first: writes, then interactive reads, then background refreshes
+PRIORITY_WRITE = 0
+PRIORITY_READ = 1
+PRIORITY_BACKGROUND = 2
+
+# Per-minute quotas (the Sheets API default is 60 read and 60 write requests per user per minute)
+READS_PER_MINUTE = int(os.environ.get("SHEETS_READS_PER_MINUTE", 60))
+WRITES_PER_MINUTE = int(os.environ.get("SHEETS_WRITES_PER_MINUTE", 60))
+# Retries after a 429, and the backoff bounds (seconds)
+MAX_RETRIES = 5
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 32.0
+
+
+# Function to name a request for tracing (e.g. "sheets.spreadsheets.values.get")
+def request_name(request):
+    return getattr(request, 'methodId', None) or getattr(request, 'operation', None) or request.method
+
+
+# Token bucket refilled continuously at per_minute / 60 tokens per second
+class TokenBucket:
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1, per_minute // 6)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    # Function to take a token; returns 0 on success, or the seconds until one is available
+    def take(self):
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    # Function to empty the bucket after the API reported that the quota is exhausted
+    def drain(self):
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+# Result of an in-flight read that identical reads wait for instead of sending their own
+class _InflightCall:
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def set_result(self, result):
+        self._result = result
+        self._done.set()
+
+    def set_error(self, error):
+        self._error = error
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+# Process-wide scheduler every Sheets request goes through. It keeps all sessions within
+# the read/write quotas with token buckets, serves waiting requests by priority,
+# coalesces identical in-flight reads and backs off with jitter on 429.
+class RequestScheduler:
+    def __init__(self, reads_per_minute=READS_PER_MINUTE, writes_per_minute=WRITES_PER_MINUTE, max_retries=MAX_RETRIES):
+        self.max_retries = max_retries
+        self._buckets = {READ: TokenBucket(reads_per_minute), WRITE: TokenBucket(writes_per_minute)}
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._tickets = count()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    # Function to check whether a waiting ticket is the next one to be served
+    def _is_next(self, ticket):
+        priority, number, kind = ticket
+        for other_priority, other_number, other_kind in self._waiting:
+            if other_kind == kind and (other_priority, other_number) < (priority, number):
+                return False
+            # Background refreshes also give way to any queued write
+            if priority == PRIORITY_BACKGROUND and other_kind == WRITE:
+                return False
+        return True
+
+    # Function to block until the request may be sent
+    def _acquire(self, kind, priority):
+        ticket = (priority, next(self._tickets), kind)
+        with self._cond:
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    timeout = None
+                    if self._is_next(ticket):
+                        timeout = self._buckets[kind].take()
+                        if timeout == 0:
+                            return
+                    self._cond.wait(timeout=timeout)
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+
+    # Function to send a request, retrying with jittered exponential backoff on 429
+    def _send(self, request, kind, priority):
+        with tracer.span(f"api {request_name(request)}", kind=kind, retries=0, wait_ms=0.0) as fields:
+            for attempt in range(self.max_retries + 1):
+                fields['retries'] = attempt
+                waited = time.perf_counter()
+                self._acquire(kind, priority)
+                fields['wait_ms'] += round((time.perf_counter() - waited) * 1000, 3)
+                try:
+                    result = request.execute()
+                    if tracer.enabled:
+                        fields['bytes'] = len(json.dumps(result))
+                    return result
+                except HttpError as e:
+                    fields['status'] = e.resp.status
+                    if e.resp.status != 429 or attempt == self.max_retries:
+                        raise
+                    with self._cond:
+                        self._buckets[kind].drain()
+                    time.sleep(min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+    # Function to execute a Sheets request under the shared quota.
+    # kind is READ or WRITE; background marks reads that no user is waiting for. Pass
+    # coalesce=False for reads that must see every write made before them (reads taken
+    # under a tab's write lock): an identical read already in flight may predate the write.
+    def execute(self, request, kind=READ, background=False, coalesce=True):
+        if kind == WRITE:
+            return self._send(request, kind, PRIORITY_WRITE)
+
+        priority = PRIORITY_BACKGROUND if background else PRIORITY_READ
+        if not coalesce:
+            return self._send(request, kind, priority)
+        key = (request.method, request.uri, request.body)
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InflightCall()
+        if not leader:
+            with tracer.span(f"api {request_name(request)}", kind=kind, coalesced=True):
+                return call.wait()
+
+        try:
+            result = self._send(request, kind, priority)
+            call.set_result(result)
+            return result
+        except BaseException as e:
+            call.set_error(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+
+# Process-wide scheduler shared by every Streamlit session
+api_scheduler = RequestScheduler()
@@ -0,0 +1,132 @@
+# batch_entry.py
+import pandas as pd
+import streamlit as st
+from googleapiclient.errors import HttpError
+
+from row_import import cell_to_text, validate_theater_rows, validate_video_call_rows
+from theater_rows import EXPECTED_HEADERS as THEATER_HEADERS
+from theater_show import SHOW_TYPES, SETLISTS
+from video_call import SESSIONS, TIME_SLOTS
+from event_colors import event_color_registry
+from write_queue import write_queue, KIND_THEATER, KIND_VIDEO_CALL
+
+# Rows offered by the theater grid (a week of shows); the Video Call grid has one row per session
+THEATER_BATCH_ROWS = 7
+
+# Function to turn the edited grid into rows of text. The first `prefilled` columns are
+# filled in by the grid itself, so rows with nothing entered after them are left out.
+def grid_rows(frame, prefilled):
+    rows = []
+    for record in frame.itertuples(index=False):
+        row = [cell_to_text(None if pd.isna(value) else value) for value in record]
+        if any(row[prefilled:]):
+            rows.append(row)
+    return rows
+
+# Function to turn unit songs typed on one line ("Song1; Song2") into the sheet's "- Song" lines
+def unit_song_lines(text):
+    if '\n' in text or ';' not in text:
+        return text
+    return '\n'.join(f"- {song.strip().lstrip('-').strip()}" for song in text.split(';') if song.strip())
+
+# Function to get a session-scoped key that changes after each saved batch, so the grid starts empty again
+def grid_key(sheet_title):
+    round_key = f"batch_entry_round_{sheet_title}"
+    return f"batch_entry_grid_{sheet_title}_{st.session_state.get(round_key, 0)}", round_key
+
+# Function to render the grid that enters several theater rows at once
+def theater_batch_form(spreadsheet_id, sheet_title, data):
+    # Rows still in the write queue count as taken numbers
+    pending_nos = {row[0] for row in write_queue.pending_rows(spreadsheet_id, sheet_title)}
+    last_no = max([data.max_key] + [int(no) for no in pending_nos if no.isdigit()])
+    grid = pd.DataFrame({
+        'NO': [str(last_no + i) for i in range(1, THEATER_BATCH_ROWS + 1)],
+        'Tanggal': pd.to_datetime(pd.Series([None] * THEATER_BATCH_ROWS)),
+        'Show': pd.Series([None] * THEATER_BATCH_ROWS, dtype=object),
+        'Setlist': pd.Series([None] * THEATER_BATCH_ROWS, dtype=object),
+        'Unit Song': [''] * THEATER_BATCH_ROWS
+    })
+    key, round_key = grid_key(sheet_title)
+    with st.form(f"batch_entry_form_{sheet_title}"):
+        edited = st.data_editor(grid, key=key, num_rows="dynamic", hide_index=True, use_container_width=True, column_config={
+            'NO': st.column_config.TextColumn("NO", help="Unique number for the show"),
+            'Tanggal': st.column_config.DateColumn("Tanggal", format="DD/MM/YYYY"),
+            'Show': st.column_config.SelectboxColumn("Show", options=SHOW_TYPES),
+            'Setlist': st.column_config.SelectboxColumn("Setlist", options=SETLISTS),
+            'Unit Song': st.column_config.TextColumn("Unit Song", help="Unit songs separated by ';' (e.g., Song1; Song2)")
+        })
+        if not st.form_submit_button("Save rows"):
+            return
+
+    rows = grid_rows(edited, prefilled=1)
+    for row in rows:
+        row[4] = unit_song_lines(row[4])
+    valid_rows, errors = validate_theater_rows(rows, data, taken=pending_nos)
+    if errors:
+        for message in errors:
+            st.error(message)
+        st.error(f"{len(errors)} of {len(rows)} rows failed validation. Nothing was saved.")
+        return
+    if not valid_rows:
+        st.warning("Fill in at least one row.")
+        return
+
+    # One journal transaction: the background worker writes the rows with one batchUpdate
+    write_queue.enqueue_many(spreadsheet_id, sheet_title, KIND_THEATER, valid_rows)
+    st.session_state[round_key] = st.session_state.get(round_key, 0) + 1
+    st.success(f"Saved {len(valid_rows)} rows (NO {valid_rows[0][0]}-{valid_rows[-1][0]}). They will be synced to the sheet shortly.")
+
+# Function to render the grid that enters a day of Video Call sessions at once
+def video_call_batch_form(service, spreadsheet_id, sheet_title, headers):
+    try:
+        event_colors = event_color_registry.colors(service, spreadsheet_id, sheet_title)
+    except HttpError as e:
+        st.error(f"Error fetching event colors: {e}")
+        event_colors = {}
+
+    grid = pd.DataFrame({
+        'Sesi': SESSIONS,
+        'Waktu': TIME_SLOTS,
+        'Tanggal': pd.to_datetime(pd.Series([None] * len(SESSIONS))),
+        'Nama Event': [''] * len(SESSIONS)
+    })
+    key, round_key = grid_key(sheet_title)
+    with st.form(f"batch_entry_form_{sheet_title}"):
+        day = st.date_input("Tanggal", help="Date of the rows whose Tanggal is left empty", key=f"batch_entry_day_{sheet_title}")
+        edited = st.data_editor(grid, key=key, num_rows="dynamic", hide_index=True, use_container_width=True, column_config={
+            'Sesi': st.column_config.SelectboxColumn("Sesi", options=SESSIONS),
+            'Waktu': st.column_config.SelectboxColumn("Waktu", options=TIME_SLOTS),
+            'Tanggal': st.column_config.DateColumn("Tanggal", format="DD/MM/YYYY", help="Leave empty to use the date above"),
+            'Nama Event': st.column_config.TextColumn("Nama Event", help="Leave empty to skip the session")
+        })
+        new_event_color = st.color_picker("Color for new events", value="#FFFFFF",
+                                          help="Events that already have a color keep it")
+        if not st.form_submit_button("Save rows"):
+            return
+
+    rows = grid_rows(edited, prefilled=2)
+    for row in rows:
+        row[2] = row[2] or day.strftime("%d/%m/%Y")
+    valid_rows, errors = validate_video_call_rows(rows, headers)
+    if errors:
+        for message in errors:
+            st.error(message)
+        st.error(f"{len(errors)} of {len(rows)} rows failed validation. Nothing was saved.")
+        return
+    if not valid_rows:
+        st.warning("Fill in the event of at least one session.")
+        return
+
+    # One journal transaction: the worker writes the rows and any new event color in one batchUpdate
+    colors = {row[3]: event_colors.get(row[3], new_event_color) for row in valid_rows}
+    write_queue.enqueue_many(spreadsheet_id, sheet_title, KIND_VIDEO_CALL, valid_rows, event_colors=colors)
+    st.session_state[round_key] = st.session_state.get(round_key, 0) + 1
+    st.success(f"Saved {len(valid_rows)} sessions. They will be synced to the sheet shortly.")
+
+# Function to render the batch entry panel for the selected sheet
+def batch_entry_form(service, spreadsheet_id, sheet_title, headers, data, month_sections, total_rows):
+    with st.expander(f"Add several rows to {sheet_title}"):
+        if headers == THEATER_HEADERS:
+            theater_batch_form(spreadsheet_id, sheet_title, data)
+        else:
+            video_call_batch_form(service, spreadsheet_id, sheet_title, headers)
@@ -0,0 +1,322 @@
+# benchmark.py
+# Call-count, payload, parse-time and snapshot-memory benchmark against the in-memory Sheets fake.
+# Run with `python benchmark.py`; it exits with status 1 when a user action needs more
+# API round-trips than its budget in CALL_BUDGETS, or when a write leaves the fake sheet or
+# the cached snapshot different from what it should be.
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+# The fake has no quota, so keep the scheduler's token buckets out of the measurements
+os.environ.setdefault("SHEETS_READS_PER_MINUTE", "1000000")
+os.environ.setdefault("SHEETS_WRITES_PER_MINUTE", "1000000")
+os.environ.setdefault("WRITE_QUEUE_PATH", ":memory:")
+
+from fake_sheets import FakeSheetsService
+from snapshot_cache import snapshot_cache
+from sheet_metadata import sheet_registry
+from theater_show import display_theater_content
+from theater_rows import EXPECTED_HEADERS as THEATER_HEADERS, MONTH_NAMES_ID, month_key, parse_theater_values, extend_theater_snapshot
+from video_call import display_video_call_content
+from video_call_rows import EXPECTED_HEADERS as VIDEO_CALL_HEADERS, parse_video_call_values, extend_video_call_snapshot
+from write_queue import flush_entries, KIND_THEATER, KIND_VIDEO_CALL
+from utils import get_sheet_id
+from tab_prefetch import tab_prefetcher
+from incremental_sync import incremental_sync
+from event_colors import event_color_registry
+
+SPREADSHEET_ID = "benchmark-spreadsheet"
+THEATER_SHEET = "theater_test"
+VIDEO_CALL_SHEET = "VC 2025_test"
+SIZES = [1000, 10000, 100000]
+
+# Most API round-trips each user action may take
+CALL_BUDGETS = {
+    "theater page load (cold)": 1,
+    "theater page load (warm)": 0,
+    "video call page load (cold)": 1,
+    "all tabs prefetch (cold)": 1,
+    "tab switch after prefetch": 0,
+    "theater append, existing month (cold metadata)": 3,
+    "theater append, existing month (warm metadata)": 2,
+    "theater append, new month (warm metadata)": 2,
+    "theater queue flush (warm metadata)": 2,
+    "video call queue flush, new event color (warm metadata)": 3,
+    "video call queue flush, known event color (warm metadata)": 2,
+    "theater page load after own write": 0,
+    "video call page load after own write": 0,
+    "video call refresh after another client appended": 1,
+}
+
+# Function to build a synthetic theater tab with n data rows spread over month sections
+def make_theater_rows(n):
+    rows = [["ALAMANDA THEATER"], ["Daftar Show"], THEATER_HEADERS]
+    per_month = max(20, n // 120)
+    for number in range(1, n + 1):
+        month_offset = (number - 1) // per_month
+        year, month = 2000 + month_offset // 12, month_offset % 12 + 1
+        if (number - 1) % per_month == 0:
+            rows.append([f"{MONTH_NAMES_ID[month]} {year}"])
+            rows.append(THEATER_HEADERS)
+        day = (number - 1) % per_month % 28 + 1
+        rows.append([str(number), f"{day:02d}/{month:02d}/{year}", "Reguler", "Aitakatta", "- Song A\n- Song B"])
+    return rows
+
+# Function to build a synthetic Video Call tab with n data rows
+def make_video_call_rows(n):
+    rows = [["ALAMANDA VIDEO CALL"], ["Jadwal"], VIDEO_CALL_HEADERS]
+    for number in range(n):
+        rows.append([f"sesi {number % 6 + 1}", "11:15 WIB - 12:15 WIB", f"{number % 28 + 1}, Januari 2025", f"Event {number % 40}"])
+    return rows
+
+# Function to build a fake spreadsheet holding both tabs
+def make_service(n):
+    service = FakeSheetsService(SPREADSHEET_ID)
+    service.add_sheet(THEATER_SHEET, make_theater_rows(n))
+    service.add_sheet(VIDEO_CALL_SHEET, make_video_call_rows(n))
+    return service
+
+# Function to forget every cache so the next action starts cold
+def reset_caches():
+    snapshot_cache.clear()
+    incremental_sync.clear()
+    sheet_registry.invalidate(SPREADSHEET_ID)
+
+# Function to run an action and return the API calls it made
+def record_calls(service, action):
+    service.reset_calls()
+    action()
+    return list(service.calls)
+
+# Function to read a tab's values from the fake (outside the recorded calls)
+def sheet_values(service, sheet_title):
+    return service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=sheet_title, fields="values").execute().get('values', [])
+
+# Function to compare the cached snapshot of a tab with a fresh parse of the fake's values.
+# Written rows are added at the end of the cached row store rather than at their sheet
+# position, so rows are compared as sorted lists.
+def snapshot_problems(service, sheet_title, parse, context):
+    cached = snapshot_cache.get_stale(SPREADSHEET_ID, sheet_title)
+    if cached is None:
+        return [f"{context}: no cached snapshot of {sheet_title}"]
+    fresh = parse(sheet_values(service, sheet_title))
+    problems = []
+    if cached[0] != fresh[0]:
+        problems.append(f"{context}: cached headers {cached[0]} != {fresh[0]}")
+    if sorted(cached[1]) != sorted(fresh[1]):
+        problems.append(f"{context}: cached rows differ from the sheet ({len(cached[1])} cached, {len(fresh[1])} on the sheet)")
+    if cached[2] is not None or fresh[2] is not None:
+        sections = lambda index: {title: (index[title]['start_row'], index[title]['row_count']) for title in index}
+        if sections(cached[2]) != sections(fresh[2]) or cached[2].ordered_titles() != fresh[2].ordered_titles():
+            problems.append(f"{context}: cached month sections differ from the sheet")
+    if cached[3] != fresh[3]:
+        problems.append(f"{context}: cached total rows {cached[3]} != {fresh[3]}")
+    return problems
+
+# Function to find the month sections of a theater tab on the fake: returns {title: (title
+# row index, data NOs)} in sheet order, and problems with section layout
+def theater_sections(service):
+    sections = {}
+    problems = []
+    values = sheet_values(service, THEATER_SHEET)
+    current = None
+    for index, row in enumerate(values[3:], start=3):
+        if row and row[0] and not any(row[1:]):
+            if row[0] in sections:
+                problems.append(f"month section {row[0]} appears twice")
+            current = row[0]
+            sections[current] = (index, [])
+            if index + 1 >= len(values) or values[index + 1][:len(THEATER_HEADERS)] != THEATER_HEADERS:
+                problems.append(f"month section {current} is not followed by a header row")
+        elif row and row[0] not in THEATER_HEADERS and current is not None:
+            sections[current][1].append(row[0])
+    return sections, problems
+
+# Function to check that each NO appears once on the theater tab, in the expected section
+def theater_placement_problems(service, expected, context):
+    sections, problems = theater_sections(service)
+    problems = [f"{context}: {problem}" for problem in problems]
+    for no, month in expected.items():
+        found = [title for title, (_, nos) in sections.items() for _ in range(nos.count(no))]
+        if found != [month]:
+            problems.append(f"{context}: NO {no} found under {found or 'no section'}, expected once under {month}")
+    keys = [month_key(title) for title in sections]
+    if keys != sorted(keys):
+        problems.append(f"{context}: month sections are not in chronological order")
+    return problems
+
+# Function to measure the round-trips of each user action on a small sheet, checking the
+# sheet contents and the cached snapshots after each write. Returns the calls made by each
+# action and the content problems found.
+def measure_round_trips():
+    results = {}
+    problems = []
+    service = make_service(1000)
+
+    reset_caches()
+    results["theater page load (cold)"] = record_calls(service, lambda: display_theater_content(service, SPREADSHEET_ID, THEATER_SHEET))
+    results["theater page load (warm)"] = record_calls(service, lambda: display_theater_content(service, SPREADSHEET_ID, THEATER_SHEET))
+    results["video call page load (cold)"] = record_calls(service, lambda: display_video_call_content(service, SPREADSHEET_ID, VIDEO_CALL_SHEET))
+
+    reset_caches()
+    loaders = {
+        THEATER_SHEET: (parse_theater_values, extend_theater_snapshot),
+        VIDEO_CALL_SHEET: (parse_video_call_values, extend_video_call_snapshot)
+    }
+    futures = {}
+    results["all tabs prefetch (cold)"] = record_calls(
+        service, lambda: futures.update(tab_prefetcher.load(service, SPREADSHEET_ID, loaders, wait_for=THEATER_SHEET)))
+    for future in futures.values():
+        future.result()
+    results["tab switch after prefetch"] = record_calls(service, lambda: display_video_call_content(service, SPREADSHEET_ID, VIDEO_CALL_SHEET))
+
+    # A submitted row is journaled by the form (after the rerun read the tab) and written
+    # by the queue worker's flush, on its own when nothing else is queued
+    outcome = {}
+    def append(row, entry_id):
+        display_theater_content(service, SPREADSHEET_ID, THEATER_SHEET)
+        entries = [{"id": entry_id, "row": list(row), "event_color": None}]
+        return lambda: outcome.update(zip(("written", "rejected"), flush_entries(service, SPREADSHEET_ID, THEATER_SHEET, KIND_THEATER, entries)))
+
+    reset_caches()
+    action = append(("100001", "05/01/2000", "Reguler", "Pajama", "- Song C"), 1)
+    results["theater append, existing month (cold metadata)"] = record_calls(service, action)
+    action = append(("100002", "06/01/2000", "Reguler", "Pajama", "- Song C"), 2)
+    results["theater append, existing month (warm metadata)"] = record_calls(service, action)
+    expected = {"100001": "Januari 2000", "100002": "Januari 2000"}
+    problems += theater_placement_problems(service, expected, "theater append, existing month")
+    problems += snapshot_problems(service, THEATER_SHEET, parse_theater_values, "theater append, existing month")
+
+    # A back-dated month opens a new section before the existing ones
+    action = append(("100003", "01/01/1999", "Trainee", "Ramune", "- Song D"), 3)
+    results["theater append, new month (warm metadata)"] = record_calls(service, action)
+    expected["100003"] = "Januari 1999"
+    problems += theater_placement_problems(service, expected, "theater append, new month")
+    problems += snapshot_problems(service, THEATER_SHEET, parse_theater_values, "theater append, new month")
+
+    # A duplicate NO is rejected without a write, whether alone or within a batch
+    calls = record_calls(service, append(("100002", "08/01/2000", "Reguler", "Pajama", "- Song C"), 4))
+    if outcome["written"] or any(call['operation'] == 'spreadsheets.batchUpdate' for call in calls):
+        problems.append("theater append: a duplicate NO was written")
+    entries = [
+        {"id": 5, "row": ["100004", "07/01/2000", "Reguler", "RKJ", "- Song E"], "event_color": None},
+        {"id": 6, "row": ["100001", "02/02/2000", "Reguler", "RKJ", "- Song E"], "event_color": None}
+    ]
+    results["theater queue flush (warm metadata)"] = record_calls(
+        service, lambda: outcome.update(zip(("written", "rejected"), flush_entries(service, SPREADSHEET_ID, THEATER_SHEET, KIND_THEATER, entries))))
+    if [entry["id"] for entry in outcome["written"]] != [5] or [entry["id"] for entry, _ in outcome["rejected"]] != [6]:
+        problems.append("theater queue flush: the duplicate NO was not the only rejected entry")
+    expected["100004"] = "Januari 2000"
+    problems += theater_placement_problems(service, expected, "theater duplicate NO and queue flush")
+    problems += snapshot_problems(service, THEATER_SHEET, parse_theater_values, "theater queue flush")
+    get_sheet_id(service, SPREADSHEET_ID, VIDEO_CALL_SHEET)
+    event_color_registry.colors(service, SPREADSHEET_ID, VIDEO_CALL_SHEET)
+    display_video_call_content(service, SPREADSHEET_ID, VIDEO_CALL_SHEET)
+    entries = [{"id": 7, "row": ["sesi 1", "11:15 WIB - 12:15 WIB", "1, Februari 2025", "Event 1"], "event_color": "#FF0000"}]
+    results["video call queue flush, new event color (warm metadata)"] = record_calls(
+        service, lambda: flush_entries(service, SPREADSHEET_ID, VIDEO_CALL_SHEET, KIND_VIDEO_CALL, entries))
+    entries = [{"id": 8, "row": ["sesi 2", "12:15 WIB - 13:15 WIB", "1, Februari 2025", "Event 1"], "event_color": "#FF0000"}]
+    results["video call queue flush, known event color (warm metadata)"] = record_calls(
+        service, lambda: flush_entries(service, SPREADSHEET_ID, VIDEO_CALL_SHEET, KIND_VIDEO_CALL, entries))
+    if sheet_values(service, VIDEO_CALL_SHEET)[-2:] != [
+            ["sesi 1", "11:15 WIB - 12:15 WIB", "1, Februari 2025", "Event 1"],
+            ["sesi 2", "12:15 WIB - 13:15 WIB", "1, Februari 2025", "Event 1"]]:
+        problems.append("video call queue flush: the flushed rows are not the last rows of the tab")
+    if event_color_registry.colors(service, SPREADSHEET_ID, VIDEO_CALL_SHEET).get("Event 1") != "#FF0000":
+        problems.append("video call queue flush: the event color was not recorded")
+    problems += snapshot_problems(service, VIDEO_CALL_SHEET, parse_video_call_values, "video call queue flush")
+
+    # Writes replay themselves on the cached snapshot; rows another client appended at the
+    # bottom are read on their own
+    results["theater page load after own write"] = record_calls(
+        service, lambda: display_theater_content(service, SPREADSHEET_ID, THEATER_SHEET))
+    results["video call page load after own write"] = record_calls(
+        service, lambda: display_video_call_content(service, SPREADSHEET_ID, VIDEO_CALL_SHEET))
+    service.spreadsheets().values().append(spreadsheetId=SPREADSHEET_ID, range=VIDEO_CALL_SHEET, valueInputOption="RAW",
+                                           body={"values": [["sesi 2", "13:15 WIB - 14:15 WIB", "2, Februari 2025", "Event 2"]]}).execute()
+    snapshot_cache.expire(SPREADSHEET_ID, VIDEO_CALL_SHEET)
+    results["video call refresh after another client appended"] = record_calls(
+        service, lambda: display_video_call_content(service, SPREADSHEET_ID, VIDEO_CALL_SHEET))
+    problems += snapshot_problems(service, VIDEO_CALL_SHEET, parse_video_call_values, "video call refresh")
+    return results, problems
+
+# Function to measure payload size and parse time for one sheet size
+def measure_size(n, repeats=3):
+    service = make_service(n)
+    grid_bytes = record_calls(service, lambda: service.spreadsheets().get(
+        spreadsheetId=SPREADSHEET_ID, ranges=[THEATER_SHEET], includeGridData=True).execute())[0]['response_bytes']
+
+    values = None
+    def read_values():
+        nonlocal values
+        values = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=THEATER_SHEET, fields="values").execute()['values']
+    values_bytes = record_calls(service, read_values)[0]['response_bytes']
+
+    parse_seconds = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        parse_theater_values(values)
+        parse_seconds.append(time.perf_counter() - started)
+
+    # Memory held by one parsed snapshot (what the snapshot cache keeps per tab), with the
+    # response decoded from JSON like the real client does so cell strings are counted
+    payload = json.dumps(values)
+    tracemalloc.start()
+    decoded = json.loads(payload)
+    snapshot = parse_theater_values(decoded)
+    del decoded
+    snapshot_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del snapshot
+
+    return {"rows": n, "grid_bytes": grid_bytes, "values_bytes": values_bytes, "parse_ms": min(parse_seconds) * 1000,
+            "snapshot_bytes": snapshot_bytes}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API round-trips, payload bytes and parse time against the Sheets fake.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=SIZES, help="Synthetic sheet sizes (data rows)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    round_trips, problems = measure_round_trips()
+    sizes = [measure_size(n) for n in args.sizes]
+
+    failures = []
+    for action, calls in round_trips.items():
+        if len(calls) > CALL_BUDGETS[action]:
+            failures.append(f"{action}: {len(calls)} calls, budget {CALL_BUDGETS[action]} ({', '.join(call['operation'] for call in calls)})")
+
+    if args.json:
+        for action, calls in round_trips.items():
+            print(json.dumps({"action": action, "calls": len(calls), "budget": CALL_BUDGETS[action],
+                              "response_bytes": sum(call['response_bytes'] for call in calls)}))
+        for result in sizes:
+            print(json.dumps(result))
+    else:
+        print(f"{'Action':<58} {'Calls':>5} {'Budget':>6} {'Bytes':>10}")
+        for action, calls in round_trips.items():
+            print(f"{action:<58} {len(calls):>5} {CALL_BUDGETS[action]:>6} {sum(call['response_bytes'] for call in calls):>10}")
+        print()
+        print(f"{'Rows':>8} {'includeGridData bytes':>22} {'values bytes':>14} {'parse ms':>10} {'snapshot bytes':>15}")
+        for result in sizes:
+            print(f"{result['rows']:>8} {result['grid_bytes']:>22} {result['values_bytes']:>14} {result['parse_ms']:>10.1f} "
+                  f"{result['snapshot_bytes']:>15}")
+
+    if failures:
+        print()
+        print("Round-trip budget exceeded:")
+        for failure in failures:
+            print(f"  {failure}")
+    if problems:
+        print()
+        print("Content checks failed:")
+        for problem in problems:
+            print(f"  {problem}")
+    if failures or problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
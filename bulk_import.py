@@ -0,0 +1,88 @@
+# bulk_import.py
+import csv
+
+import streamlit as st
+from googleapiclient.errors import HttpError
+
+from utils import get_sheet_id
+from theater_rows import EXPECTED_HEADERS as THEATER_HEADERS, parse_theater_values, extend_theater_snapshot
+from video_call_rows import parse_video_call_values, extend_video_call_snapshot
+from row_import import (read_uploaded_rows, strip_header, validate_theater_rows, validate_video_call_rows,
+                        build_theater_import_blocks, build_video_call_import_blocks, chunk_blocks)
+from sheet_writer import sheet_writer
+from write_queue import write_queue
+
+# Function to render the bulk import panel for the selected sheet
+def bulk_import_form(service, spreadsheet_id, sheet_title, headers, data, month_sections, total_rows):
+    with st.expander(f"Bulk import into {sheet_title}"):
+        uploaded_file = st.file_uploader("CSV or XLSX file", type=["csv", "xlsx"], key=f"bulk_import_{sheet_title}",
+                                         help=f"Columns: {', '.join(headers)}. Dates in DD/MM/YYYY format.")
+        if uploaded_file is None or not st.button("Import rows", key=f"bulk_import_submit_{sheet_title}"):
+            return
+
+        try:
+            rows, lines = strip_header(*read_uploaded_rows(uploaded_file), headers)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            st.error(f"Could not read the file: {e}")
+            return
+
+        if headers == THEATER_HEADERS:
+            # Rows still in the write queue count as taken numbers
+            pending_nos = {row[0] for row in write_queue.pending_rows(spreadsheet_id, sheet_title)}
+            valid_rows, errors = validate_theater_rows(rows, data, taken=pending_nos, lines=lines)
+        else:
+            valid_rows, errors = validate_video_call_rows(rows, headers, lines=lines)
+        if errors:
+            for message in errors[:20]:
+                st.error(message)
+            st.error(f"{len(errors)} of {len(rows)} rows failed validation. Nothing was imported.")
+            return
+        if not valid_rows:
+            st.warning("The file has no rows to import.")
+            return
+
+        # Other writers wait while the import runs; positions are planned on the current sheet
+        # state (a range probe), not on the snapshot this rerun started from
+        progress = st.progress(0.0, text=f"Importing {len(valid_rows)} rows...")
+        written = 0
+        with sheet_writer.lock(spreadsheet_id, sheet_title):
+            try:
+                if headers == THEATER_HEADERS:
+                    snapshot = sheet_writer.current(service, spreadsheet_id, sheet_title, parse_theater_values, extend_theater_snapshot)
+                else:
+                    snapshot = sheet_writer.current(service, spreadsheet_id, sheet_title, parse_video_call_values, extend_video_call_snapshot)
+            except (HttpError, ValueError) as e:
+                st.error(f"Could not read the current sheet: {e}")
+                return
+            current_headers, current_data, current_sections, current_total = snapshot
+            sheet_id = get_sheet_id(service, spreadsheet_id, sheet_title)
+            if sheet_id is None:
+                st.error("Could not retrieve sheet ID for formatting.")
+                return
+
+            if headers == THEATER_HEADERS:
+                # Numbers may have been taken since the file was validated (every row passed, so
+                # the rows still match their file lines)
+                pending_nos = {row[0] for row in write_queue.pending_rows(spreadsheet_id, sheet_title)}
+                valid_rows, errors = validate_theater_rows(valid_rows, current_data, taken=pending_nos, lines=lines)
+                if errors:
+                    for message in errors[:20]:
+                        st.error(message)
+                    st.error(f"{len(errors)} rows conflict with rows added meanwhile. Nothing was imported.")
+                    return
+                blocks = build_theater_import_blocks(sheet_id, current_headers, current_sections, current_total, valid_rows)
+            else:
+                blocks = build_video_call_import_blocks(sheet_id, current_total, valid_rows)
+            chunks = chunk_blocks(blocks, len(headers))
+
+            # Stream the chunks and report progress after each batchUpdate
+            try:
+                for chunk in chunks:
+                    sheet_writer.commit(service, spreadsheet_id, sheet_title, snapshot, chunk['requests'])
+                    written += chunk['rows']
+                    progress.progress(written / len(valid_rows), text=f"Imported {written} of {len(valid_rows)} rows")
+            except HttpError as e:
+                st.error(f"Import stopped after {written} of {len(valid_rows)} rows: {e}")
+
+        if written == len(valid_rows):
+            st.success(f"Successfully imported {written} rows into {sheet_title}.")
@@ -0,0 +1,150 @@
+# cli.py
+# Command line entry point for scripts and cron jobs. Appends rows read from CSV/XLSX files
+# (or CSV on stdin) to a sheet with the same validation and write path as the Streamlit app:
+#
+#   python cli.py append theater_test shows.csv
+#   python cli.py append "VC 2025_test" --kind video_call --color "#FFD966" < calls.csv
+#
+# Only the standard library and the streamlit-free row modules are imported up front; the
+# Google client is imported when the sheet is written, so --help and --dry-run start fast.
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+
+from theater_rows import EXPECTED_HEADERS as THEATER_HEADERS
+from video_call_rows import EXPECTED_HEADERS as VIDEO_CALL_HEADERS
+from row_import import read_uploaded_rows, strip_header, validate_theater_rows, validate_video_call_rows
+from row_store import RowStore
+
+DEFAULT_SPREADSHEET_ID = os.environ.get("SPREADSHEET_ID", "1J8WJobKJSeDEybF7rdDAB6hoFQCyeKsd8TcgOsMCIlo")
+DEFAULT_CREDENTIALS = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "credentials.json")
+
+# Sheet kinds, as in write_queue.KIND_THEATER and write_queue.KIND_VIDEO_CALL
+KIND_HEADERS = {"theater": THEATER_HEADERS, "video_call": VIDEO_CALL_HEADERS}
+
+# Exit statuses: rows rejected or the write failed, and unusable input
+EXIT_FAILED = 1
+EXIT_INVALID = 2
+
+
+# Function to read the rows of every input ("-" is CSV on stdin), without repeated header lines.
+# Returns (name, rows, line numbers) triples.
+def read_inputs(paths, headers):
+    inputs = []
+    for path in paths or ["-"]:
+        if path == "-":
+            rows, lines = read_uploaded_rows(sys.stdin.buffer)
+        else:
+            with open(path, "rb") as f:
+                rows, lines = read_uploaded_rows(f)
+        inputs.append((path if path != "-" else "<stdin>", *strip_header(rows, lines, headers)))
+    return inputs
+
+# Function to validate the rows of every input. NO duplicates are checked across the inputs
+# here and against the sheet when the rows are written. Returns the valid rows and the errors.
+def validate_inputs(kind, inputs):
+    headers = KIND_HEADERS[kind]
+    seen = RowStore(headers, key_column=0)
+    valid_rows = []
+    errors = []
+    for name, rows, lines in inputs:
+        if kind == "theater":
+            file_rows, file_errors = validate_theater_rows(rows, seen, lines=lines)
+            seen.extend(file_rows)
+        else:
+            file_rows, file_errors = validate_video_call_rows(rows, headers, lines=lines)
+        valid_rows.extend(file_rows)
+        errors.extend(f"{name}: {message}" for message in file_errors)
+    return valid_rows, errors
+
+# Function to write rows through the write-queue flush (one batchUpdate per batch).
+# Returns the number of written rows and the (row, reason) pairs that were rejected.
+def write_rows(args, rows):
+    # Imported here: the Google client takes most of the start-up time
+    from googleapiclient.errors import HttpError
+    from sheets_client import SheetsClientManager
+    from write_queue import flush_entries, PermanentWriteError, MAX_BATCH_SIZE
+
+    with open(args.credentials) as f:
+        manager = SheetsClientManager(json.load(f), pool_size=1)
+
+    entries = [{"id": i, "row": row, "event_color": args.color} for i, row in enumerate(rows)]
+    written = 0
+    rejected = []
+    with manager.lease() as service:
+        for start in range(0, len(entries), MAX_BATCH_SIZE):
+            try:
+                batch_written, batch_rejected = flush_entries(
+                    service, args.spreadsheet_id, args.sheet, args.kind, entries[start:start + MAX_BATCH_SIZE])
+            except (HttpError, PermanentWriteError) as e:
+                raise RuntimeError(f"Write stopped after {written} of {len(rows)} rows: {e}")
+            written += len(batch_written)
+            rejected.extend((entry["row"], reason) for entry, reason in batch_rejected)
+    return written, rejected
+
+# Function to run the append command
+def append_command(args):
+    try:
+        inputs = read_inputs(args.files, KIND_HEADERS[args.kind])
+    except (OSError, ValueError, UnicodeDecodeError, csv.Error) as e:
+        print(f"Could not read the input: {e}", file=sys.stderr)
+        return EXIT_INVALID
+
+    rows, errors = validate_inputs(args.kind, inputs)
+    if errors:
+        for message in errors:
+            print(message, file=sys.stderr)
+        print(f"{len(errors)} rows failed validation. Nothing was written.", file=sys.stderr)
+        return EXIT_INVALID
+    if not rows:
+        print("The input has no rows to write.", file=sys.stderr)
+        return 0
+
+    if args.dry_run:
+        csv.writer(sys.stdout).writerows(rows)
+        return 0
+
+    try:
+        written, rejected = write_rows(args, rows)
+    except (OSError, ValueError) as e:
+        print(f"Could not load the credentials: {e}", file=sys.stderr)
+        return EXIT_INVALID
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_FAILED
+
+    for row, reason in rejected:
+        print(f"Rejected {row}: {reason}", file=sys.stderr)
+    print(f"Wrote {written} rows to {args.sheet}.")
+    return EXIT_FAILED if rejected else 0
+
+# Function to build the argument parser
+def build_parser():
+    parser = argparse.ArgumentParser(description="Update the Alamanda spreadsheet without the Streamlit UI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    append = commands.add_parser("append", help="Append rows from CSV/XLSX files or CSV on stdin")
+    append.add_argument("sheet", help="Sheet (tab) title, e.g. theater_test")
+    append.add_argument("files", nargs="*", help="CSV or XLSX files; '-' or none reads CSV from stdin")
+    append.add_argument("--kind", choices=sorted(KIND_HEADERS), default="theater",
+                        help="Layout of the sheet (default: theater)")
+    append.add_argument("--color", help="Event color (#RRGGBB) for Video Call rows")
+    append.add_argument("--dry-run", action="store_true", help="Validate and print the rows without writing them")
+    append.add_argument("--spreadsheet-id", default=DEFAULT_SPREADSHEET_ID,
+                        help="Spreadsheet to update (default: $SPREADSHEET_ID or the app's spreadsheet)")
+    append.add_argument("--credentials", default=DEFAULT_CREDENTIALS,
+                        help="Service account JSON key (default: $GOOGLE_APPLICATION_CREDENTIALS or credentials.json)")
+    append.set_defaults(handler=append_command)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# data_viewer.py
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from googleapiclient.errors import HttpError
+
+from api_scheduler import api_scheduler, READ
+from snapshot_cache import SnapshotCache
+from tracing import traced
+from utils import a1_range, col_index_to_letter, pad_row
+
+# First sheet row shown by the viewer (rows 1-3 hold the title rows and the headers)
+FIRST_DATA_ROW = 4
+PAGE_SIZES = [25, 50, 100]
+# Seconds a fetched page stays fresh, and how many pages are kept across all sessions
+PAGE_TTL = 120
+MAX_CACHED_PAGES = 64
+
+# Pages are keyed by (sheet_title, total_rows, first_row): any insert changes total_rows,
+# so pages read before a write are never served after it
+page_cache = SnapshotCache(ttl=PAGE_TTL, max_entries=MAX_CACHED_PAGES)
+_prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sheets-prefetch")
+_prefetching = set()
+_prefetching_lock = threading.Lock()
+
+
+# Function to read one window of sheet rows (1-based, inclusive) with a range read
+@traced("fetch_row_window")
+def fetch_row_window(service, spreadsheet_id, sheet_title, first_row, last_row, width, background=False):
+    result = api_scheduler.execute(service.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id,
+        range=a1_range(sheet_title, f"A{first_row}:{col_index_to_letter(width - 1)}{last_row}"),
+        valueRenderOption="FORMATTED_VALUE",
+        fields="values"
+    ), READ, background=background)
+    rows = [pad_row(row, width) for row in result.get('values', [])]
+    return rows + [pad_row([], width) for _ in range(last_row - first_row + 1 - len(rows))]
+
+# Function to get a page from the cache or the API
+def load_page(service, spreadsheet_id, sheet_title, total_rows, first_row, last_row, width):
+    key = (sheet_title, total_rows, first_row)
+    rows = page_cache.get(spreadsheet_id, key)
+    if rows is None:
+        rows = fetch_row_window(service, spreadsheet_id, sheet_title, first_row, last_row, width)
+        page_cache.put(spreadsheet_id, key, rows)
+    return rows
+
+# Function to fetch a page in the background with its own pooled transport
+def _prefetch(manager, spreadsheet_id, sheet_title, total_rows, first_row, last_row, width):
+    key = (sheet_title, total_rows, first_row)
+    try:
+        if page_cache.get(spreadsheet_id, key) is None:
+            with manager.lease() as service:
+                rows = fetch_row_window(service, spreadsheet_id, sheet_title, first_row, last_row, width, background=True)
+            page_cache.put(spreadsheet_id, key, rows)
+    except HttpError:
+        pass  # Prefetching is best effort; the page is read again when it is opened
+    finally:
+        with _prefetching_lock:
+            _prefetching.discard((spreadsheet_id, key))
+
+# Function to queue background reads of the pages next to the visible one
+def prefetch_pages(manager, spreadsheet_id, sheet_title, total_rows, page_size, page, page_count, width):
+    for neighbour in (page + 1, page - 1):
+        if not 0 <= neighbour < page_count:
+            continue
+        first_row = FIRST_DATA_ROW + neighbour * page_size
+        last_row = min(first_row + page_size - 1, total_rows)
+        key = (sheet_title, total_rows, first_row)
+        with _prefetching_lock:
+            if (spreadsheet_id, key) in _prefetching:
+                continue
+            _prefetching.add((spreadsheet_id, key))
+        _prefetch_pool.submit(_prefetch, manager, spreadsheet_id, sheet_title, total_rows, first_row, last_row, width)
+
+# Function to render the paginated view of a sheet
+def data_viewer(manager, service, spreadsheet_id, sheet_title, headers, month_sections, total_rows):
+    with st.expander(f"Browse {sheet_title}"):
+        if total_rows < FIRST_DATA_ROW:
+            st.info("The sheet has no rows yet.")
+            return
+
+        page_key = f"viewer_page_{sheet_title}"
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f"viewer_page_size_{sheet_title}")
+        page_count = math.ceil((total_rows - FIRST_DATA_ROW + 1) / page_size)
+        if page_key not in st.session_state:
+            st.session_state[page_key] = page_count - 1  # Start on the latest rows
+
+        # Jump to a month section using the month index
+        if month_sections:
+            titles = month_sections.ordered_titles()
+            month = st.selectbox("Jump to month", [""] + titles, key=f"viewer_month_{sheet_title}")
+            if month and st.button("Go", key=f"viewer_go_{sheet_title}"):
+                st.session_state[page_key] = (month_sections[month]['start_row'] - FIRST_DATA_ROW) // page_size
+
+        previous_col, position_col, next_col = st.columns([1, 2, 1])
+        if previous_col.button("Previous", key=f"viewer_previous_{sheet_title}"):
+            st.session_state[page_key] -= 1
+        if next_col.button("Next", key=f"viewer_next_{sheet_title}"):
+            st.session_state[page_key] += 1
+        page = min(max(st.session_state[page_key], 0), page_count - 1)
+        st.session_state[page_key] = page
+
+        first_row = FIRST_DATA_ROW + page * page_size
+        last_row = min(first_row + page_size - 1, total_rows)
+        position_col.write(f"Page {page + 1} of {page_count} (rows {first_row}-{last_row})")
+
+        try:
+            rows = load_page(service, spreadsheet_id, sheet_title, total_rows, first_row, last_row, len(headers))
+        except HttpError as e:
+            st.error(f"Error fetching rows: {e}")
+            return
+
+        st.dataframe(
+            [{"Row": first_row + offset, **dict(zip(headers, row))} for offset, row in enumerate(rows)],
+            use_container_width=True,
+            hide_index=True
+        )
+        prefetch_pages(manager, spreadsheet_id, sheet_title, total_rows, page_size, page, page_count, len(headers))
@@ -0,0 +1,225 @@
+# event_colors.py
+import json
+import re
+import threading
+
+from api_scheduler import api_scheduler, READ, WRITE
+from sheet_writer import sheet_writer
+from tracing import traced
+from utils import a1_range
+
+# Developer metadata key holding the tab's {event name: "#RRGGBB"} map
+METADATA_KEY = "alamanda_event_colors"
+# Rules color columns A-D of every row from this 0-based index down (below the headers)
+RULE_START_ROW_INDEX = 3
+RULE_END_COLUMN_INDEX = 4
+# Fields read to load the colors and the conditional-format rules of one tab
+COLORS_FIELDS = "sheets(properties.sheetId,developerMetadata(metadataId,metadataKey,metadataValue),conditionalFormats)"
+
+RULE_FORMULA_PATTERN = re.compile(r'^=\$D\d+="((?:[^"]|"")*)"$')
+
+
+# Function to convert hex color to RGB (for Google Sheets API)
+def hex_to_rgb(hex_color):
+    hex_color = hex_color.lstrip('#')
+    return {
+        "red": int(hex_color[0:2], 16) / 255.0,
+        "green": int(hex_color[2:4], 16) / 255.0,
+        "blue": int(hex_color[4:6], 16) / 255.0
+    }
+
+# Function to build the conditional-format rule coloring the rows of one event
+def event_rule(sheet_id, event_name, color):
+    escaped = event_name.replace('"', '""')
+    return {
+        "ranges": [{
+            "sheetId": sheet_id,
+            "startRowIndex": RULE_START_ROW_INDEX,
+            "startColumnIndex": 0,
+            "endColumnIndex": RULE_END_COLUMN_INDEX
+        }],
+        "booleanRule": {
+            "condition": {
+                "type": "CUSTOM_FORMULA",
+                "values": [{"userEnteredValue": f'=$D{RULE_START_ROW_INDEX + 1}="{escaped}"'}]
+            },
+            "format": {"backgroundColor": hex_to_rgb(color)}
+        }
+    }
+
+# Function to get the event name a conditional-format rule was created for, if any
+def rule_event_name(rule):
+    values = rule.get('booleanRule', {}).get('condition', {}).get('values', [])
+    if len(values) != 1:
+        return None
+    match = RULE_FORMULA_PATTERN.match(values[0].get('userEnteredValue', ''))
+    return match.group(1).replace('""', '"') if match else None
+
+# Function to get the {event name: color} entries of new_colors that differ from a tab's state
+def changed_colors(state, new_colors):
+    return {event: color.upper() for event, color in new_colors.items()
+            if state['colors'].get(event, '').upper() != color.upper()}
+
+
+# Registry of the event colors of each tab. The map is persisted as developer metadata
+# on the tab, and every event has one conditional-format rule keyed on "Nama Event", so
+# rows are colored by the sheet itself and recoloring an event is a single rule update.
+class EventColorRegistry:
+    def __init__(self):
+        self._tabs = {}
+        self._lock = threading.Lock()
+
+    # Function to read the persisted colors and rule positions of a tab. Entries of the
+    # metadata key written by concurrent processes are merged (later ids win); the first one
+    # is kept and the others are deleted by the next color write. The read is not coalesced,
+    # since plan() relies on it seeing the writes made before it.
+    @traced("load_event_colors")
+    def _load(self, service, spreadsheet_id, sheet_title):
+        result = api_scheduler.execute(service.spreadsheets().get(
+            spreadsheetId=spreadsheet_id,
+            ranges=[a1_range(sheet_title)],
+            fields=COLORS_FIELDS
+        ), READ, coalesce=False)
+        sheet = result['sheets'][0]
+        state = {'sheet_id': sheet['properties']['sheetId'], 'metadata_id': None, 'extra_metadata_ids': [],
+                 'colors': {}, 'rules': []}
+        entries = sorted((metadata for metadata in sheet.get('developerMetadata', [])
+                          if metadata.get('metadataKey') == METADATA_KEY), key=lambda metadata: metadata['metadataId'])
+        for metadata in entries:
+            state['colors'].update(json.loads(metadata.get('metadataValue') or '{}'))
+        if entries:
+            state['metadata_id'] = entries[0]['metadataId']
+            state['extra_metadata_ids'] = [metadata['metadataId'] for metadata in entries[1:]]
+        state['rules'] = [rule_event_name(rule) for rule in sheet.get('conditionalFormats', [])]
+        return state
+
+    # Function to get a tab's state, loading it once per process
+    def _state(self, service, spreadsheet_id, sheet_title):
+        key = (spreadsheet_id, sheet_title)
+        with self._lock:
+            state = self._tabs.get(key)
+        if state is None:
+            state = self._reload(service, spreadsheet_id, sheet_title)
+        return state
+
+    # Function to read a tab's state again and keep it
+    def _reload(self, service, spreadsheet_id, sheet_title):
+        state = self._load(service, spreadsheet_id, sheet_title)
+        with self._lock:
+            self._tabs[(spreadsheet_id, sheet_title)] = state
+        return state
+
+    # Function to get the {event name: color} map of a tab
+    def colors(self, service, spreadsheet_id, sheet_title):
+        return dict(self._state(service, spreadsheet_id, sheet_title)['colors'])
+
+    # Function to build the batchUpdate requests that set event colors; events whose color
+    # is unchanged need no request. Call it while holding the tab's sheet_writer lock: when
+    # the cached state (or one restored from disk) calls for a write, the rules and metadata
+    # are read again and the requests are planned on that read, so another process's rules
+    # are updated in place rather than added twice. Pass the returned plan to commit() after
+    # the write.
+    def plan(self, service, spreadsheet_id, sheet_title, new_colors):
+        state = self._state(service, spreadsheet_id, sheet_title)
+        if not state.get('restored') and not changed_colors(state, new_colors):
+            return [], None
+        state = self._reload(service, spreadsheet_id, sheet_title)
+        changed = changed_colors(state, new_colors)
+        if not changed:
+            return [], None
+
+        sheet_id = state['sheet_id']
+        requests = []
+        rules = list(state['rules'])
+        for event, color in changed.items():
+            # Every rule whose formula names the event, so no older duplicate keeps the old color
+            indexes = [index for index, name in enumerate(rules) if name == event]
+            for index in indexes:
+                requests.append({"updateConditionalFormatRule": {
+                    "sheetId": sheet_id,
+                    "index": index,
+                    "rule": event_rule(sheet_id, event, color)
+                }})
+            if not indexes:
+                requests.append({"addConditionalFormatRule": {
+                    "index": len(rules),
+                    "rule": event_rule(sheet_id, event, color)
+                }})
+                rules.append(event)
+
+        for metadata_id in state['extra_metadata_ids']:
+            requests.append({"deleteDeveloperMetadata": {
+                "dataFilter": {"developerMetadataLookup": {"metadataId": metadata_id}}
+            }})
+        colors = dict(state['colors'], **changed)
+        value = json.dumps(colors, sort_keys=True)
+        # The metadata request stays last: commit() reads the created entry from the last reply
+        if state['metadata_id'] is not None:
+            requests.append({"updateDeveloperMetadata": {
+                "dataFilters": [{"developerMetadataLookup": {"metadataId": state['metadata_id']}}],
+                "developerMetadata": {"metadataValue": value},
+                "fields": "metadataValue"
+            }})
+        else:
+            requests.append({"createDeveloperMetadata": {"developerMetadata": {
+                "metadataKey": METADATA_KEY,
+                "metadataValue": value,
+                "location": {"sheetId": sheet_id},
+                "visibility": "DOCUMENT"
+            }}})
+        return requests, {'key': (spreadsheet_id, sheet_title), 'colors': colors, 'rules': rules}
+
+    # Function to record a planned change once its batchUpdate succeeded. replies are the
+    # batchUpdate replies that belong to the planned requests (in the same order).
+    def commit(self, change, replies):
+        if change is None:
+            return
+        with self._lock:
+            state = self._tabs.get(change['key'])
+            if state is None:
+                return
+            state['colors'] = change['colors']
+            state['rules'] = change['rules']
+            state['extra_metadata_ids'] = []
+            created = (replies[-1] or {}).get('createDeveloperMetadata', {}) if replies else {}
+            if 'developerMetadata' in created:
+                state['metadata_id'] = created['developerMetadata']['metadataId']
+
+    # Function to forget a tab, e.g. after a rule update failed because the sheet changed
+    def invalidate(self, spreadsheet_id, sheet_title):
+        with self._lock:
+            self._tabs.pop((spreadsheet_id, sheet_title), None)
+
+    # Function to get a copy of a tab's state for the snapshot store, or None when not loaded
+    def export(self, spreadsheet_id, sheet_title):
+        with self._lock:
+            state = self._tabs.get((spreadsheet_id, sheet_title))
+            return None if state is None else dict(state, colors=dict(state['colors']), rules=list(state['rules']),
+                                                   extra_metadata_ids=list(state.get('extra_metadata_ids', [])))
+
+    # Function to adopt a state saved by the snapshot store, unless the tab is loaded already.
+    # It serves the form's colors; plan() reads the tab again before writing any rule.
+    def restore(self, spreadsheet_id, sheet_title, state):
+        with self._lock:
+            self._tabs.setdefault((spreadsheet_id, sheet_title), dict(state, restored=True))
+
+    # Function to set event colors right away with one batchUpdate, in turn with the tab's
+    # row writes
+    def set_colors(self, service, spreadsheet_id, sheet_title, new_colors):
+        with sheet_writer.lock(spreadsheet_id, sheet_title):
+            requests, change = self.plan(service, spreadsheet_id, sheet_title, new_colors)
+            if not requests:
+                return
+            try:
+                result = api_scheduler.execute(service.spreadsheets().batchUpdate(
+                    spreadsheetId=spreadsheet_id,
+                    body={"requests": requests}
+                ), WRITE)
+            except Exception:
+                self.invalidate(spreadsheet_id, sheet_title)
+                raise
+            self.commit(change, result.get('replies', []))
+
+
+# Process-wide registry shared by every Streamlit session
+event_color_registry = EventColorRegistry()
@@ -0,0 +1,331 @@
+# fake_sheets.py
+import json
+import re
+import threading
+import time
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from utils import col_index_to_letter
+
+A1_PATTERN = re.compile(r"^(?:'((?:[^']|'')*)'|([^!]+?))(?:!([A-Z]+)?(\d+)?(?::([A-Z]+)?(\d+)?)?)?$")
+
+
+# Function to turn a column letter (A, B, ..., AA) into a 0-based index
+def col_letter_to_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - 64)
+    return index - 1
+
+# Function to split an A1 range into (title, start_row, end_row, start_col, end_col), 0-based
+# and end-exclusive; open ends are None
+def parse_a1(a1):
+    match = A1_PATTERN.match(a1)
+    if not match:
+        raise ValueError(f"Unsupported range: {a1}")
+    quoted, bare, start_col, start_row, end_col, end_row = match.groups()
+    title = quoted.replace("''", "'") if quoted is not None else bare
+    if start_col and start_row and end_col is None and end_row is None:
+        # A single cell such as A5
+        column, row = col_letter_to_index(start_col), int(start_row)
+        return title, row - 1, row, column, column + 1
+    return (
+        title,
+        int(start_row) - 1 if start_row else 0,
+        int(end_row) if end_row else None,
+        col_letter_to_index(start_col) if start_col else 0,
+        col_letter_to_index(end_col) + 1 if end_col else None
+    )
+
+# Function to drop the trailing empty cells of a row, as the API does
+def trim_row(row):
+    end = len(row)
+    while end and row[end - 1] == '':
+        end -= 1
+    return row[:end]
+
+# Function to drop trailing empty rows, as the API does
+def trim_rows(rows):
+    end = len(rows)
+    while end and not any(rows[end - 1]):
+        end -= 1
+    return rows[:end]
+
+
+# Request object returned by the fake; it mirrors googleapiclient's HttpRequest
+# (method, uri, body and execute()) so it can go through the scheduler unchanged
+class FakeRequest:
+    def __init__(self, service, operation, method, params, handler):
+        self.service = service
+        self.operation = operation
+        self.method = method
+        self.uri = f"fake://sheets/v4/{operation}?" + json.dumps({k: v for k, v in params.items() if k != 'body'}, sort_keys=True, default=str)
+        self.body = json.dumps(params['body'], sort_keys=True) if 'body' in params else None
+        self._params = params
+        self._handler = handler
+
+    def execute(self, num_retries=0):
+        return self.service._execute(self)
+
+
+# Fake of the spreadsheets().values() resource
+class _FakeValues:
+    def __init__(self, service):
+        self._service = service
+
+    def get(self, **params):
+        return FakeRequest(self._service, "values.get", "GET", params, self._service._values_get)
+
+    def batchGet(self, **params):
+        return FakeRequest(self._service, "values.batchGet", "GET", params, self._service._values_batch_get)
+
+    def append(self, **params):
+        return FakeRequest(self._service, "values.append", "POST", params, self._service._values_append)
+
+
+# Fake of the spreadsheets() resource
+class _FakeSpreadsheets:
+    def __init__(self, service):
+        self._service = service
+
+    def get(self, **params):
+        return FakeRequest(self._service, "spreadsheets.get", "GET", params, self._service._get)
+
+    def values(self):
+        return _FakeValues(self._service)
+
+    def batchUpdate(self, **params):
+        return FakeRequest(self._service, "spreadsheets.batchUpdate", "POST", params, self._service._batch_update)
+
+
+# In-memory stand-in for the subset of the Sheets v4 client the app uses. Every executed
+# request is recorded in `calls` with its payload sizes and latency; latency and HTTP
+# errors can be injected to exercise retries and slow paths.
+class FakeSheetsService:
+    def __init__(self, spreadsheet_id="fake-spreadsheet", latency=0.0):
+        self.spreadsheet_id = spreadsheet_id
+        self.latency = latency
+        self.sheets = {}
+        self._next_metadata_id = 1
+        self.calls = []
+        self._errors = []
+        self._lock = threading.Lock()
+
+    # Function to add a tab with its rows of values
+    def add_sheet(self, title, rows, column_count=26):
+        sheet_id = len(self.sheets) + 1
+        self.sheets[title] = {
+            'sheet_id': sheet_id,
+            'rows': [[str(value) for value in row] for row in rows],
+            'formats': {},
+            'conditional_formats': [],
+            'developer_metadata': [],
+            'column_count': column_count,
+            'frozen_rows': 0
+        }
+        return sheet_id
+
+    # Function to make the next `count` requests fail with an HTTP status (e.g. 429)
+    def fail_next(self, status, count=1, operation=None):
+        with self._lock:
+            self._errors.extend([(status, operation)] * count)
+
+    # Function to forget the recorded calls
+    def reset_calls(self):
+        with self._lock:
+            self.calls = []
+
+    def spreadsheets(self):
+        return _FakeSpreadsheets(self)
+
+    # Function to run a request: inject latency/errors, apply it and record the call
+    def _execute(self, request):
+        started = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            status = None
+            for position, (error_status, operation) in enumerate(self._errors):
+                if operation is None or operation == request.operation:
+                    status = error_status
+                    del self._errors[position]
+                    break
+            response = None
+            try:
+                if status is not None:
+                    raise HttpError(httplib2.Response({'status': status}), b'{"error": "injected"}', uri=request.uri)
+                response = request._handler(**request._params)
+                status = 200
+                return response
+            except HttpError as e:
+                status = e.resp.status
+                raise
+            finally:
+                self.calls.append({
+                    'operation': request.operation,
+                    'request_bytes': len(request.body or ''),
+                    'response_bytes': len(json.dumps(response)) if response is not None else 0,
+                    'seconds': time.perf_counter() - started,
+                    'status': status
+                })
+
+    # Function to find a tab by title or raise the API's 400
+    def _sheet(self, title):
+        if title not in self.sheets:
+            raise HttpError(httplib2.Response({'status': 400}), f'Unable to parse range: {title}'.encode(), uri=title)
+        return self.sheets[title]
+
+    # Function to find a tab by sheetId
+    def _sheet_by_id(self, sheet_id):
+        for sheet in self.sheets.values():
+            if sheet['sheet_id'] == sheet_id:
+                return sheet
+        raise HttpError(httplib2.Response({'status': 400}), f'No grid with id: {sheet_id}'.encode(), uri=str(sheet_id))
+
+    # Function to read the values of an A1 range
+    def _read_range(self, a1):
+        title, start_row, end_row, start_col, end_col = parse_a1(a1)
+        rows = self._sheet(title)['rows']
+        window = rows[start_row:end_row] if end_row is not None else rows[start_row:]
+        values = trim_rows([trim_row(row[start_col:end_col] if end_col is not None else row[start_col:]) for row in window])
+        end = start_row + len(values)
+        return {
+            'range': f"'{title}'!{col_index_to_letter(start_col)}{start_row + 1}:{col_index_to_letter((end_col or 26) - 1)}{max(end, start_row + 1)}",
+            'majorDimension': 'ROWS',
+            'values': values
+        }
+
+    def _values_get(self, spreadsheetId, range, fields=None, **kwargs):
+        result = self._read_range(range)
+        if fields == 'values':
+            return {'values': result['values']} if result['values'] else {}
+        if not result['values']:
+            del result['values']
+        return result
+
+    def _values_batch_get(self, spreadsheetId, ranges, fields=None, **kwargs):
+        value_ranges = []
+        for a1 in ranges:
+            result = self._read_range(a1)
+            if not result['values']:
+                del result['values']
+            value_ranges.append(result)
+        if fields == 'valueRanges(values)':
+            return {'valueRanges': [{'values': result['values']} if 'values' in result else {} for result in value_ranges]}
+        return {'spreadsheetId': spreadsheetId, 'valueRanges': value_ranges}
+
+    def _values_append(self, spreadsheetId, range, body, **kwargs):
+        title = parse_a1(range)[0]
+        rows = self._sheet(title)['rows']
+        trimmed = trim_rows(rows)
+        del rows[len(trimmed):]
+        start = len(rows)
+        rows.extend([[str(value) for value in row] for row in body['values']])
+        return {'spreadsheetId': spreadsheetId, 'updates': {'updatedRange': f"'{title}'!A{start + 1}", 'updatedRows': len(body['values'])}}
+
+    def _get(self, spreadsheetId, fields=None, ranges=None, includeGridData=False, **kwargs):
+        sheets = []
+        titles = [parse_a1(a1)[0] for a1 in ranges] if ranges else list(self.sheets)
+        for title in titles:
+            sheet = self._sheet(title)
+            entry = {'properties': {
+                'sheetId': sheet['sheet_id'],
+                'title': title,
+                'gridProperties': {
+                    'rowCount': max(len(sheet['rows']), 1000),
+                    'columnCount': sheet['column_count'],
+                    'frozenRowCount': sheet['frozen_rows']
+                }
+            }}
+            if sheet['conditional_formats']:
+                entry['conditionalFormats'] = sheet['conditional_formats']
+            if sheet['developer_metadata']:
+                entry['developerMetadata'] = sheet['developer_metadata']
+            if includeGridData:
+                entry['data'] = [{'rowData': [
+                    {'values': [{'formattedValue': value, 'userEnteredValue': {'stringValue': value},
+                                 'effectiveFormat': {'backgroundColor': {'red': 1, 'green': 1, 'blue': 1}}}
+                                for value in row]}
+                    for row in sheet['rows']
+                ]}]
+            sheets.append(entry)
+        return {'spreadsheetId': spreadsheetId, 'properties': {'title': 'Fake spreadsheet'}, 'sheets': sheets}
+
+    def _batch_update(self, spreadsheetId, body, **kwargs):
+        replies = []
+        for request in body['requests']:
+            (kind, params), = request.items()
+            handler = getattr(self, '_apply_' + kind, None)
+            replies.append(handler(params) if handler else {})
+        return {'spreadsheetId': spreadsheetId, 'replies': replies}
+
+    def _apply_insertDimension(self, params):
+        grid = params['range']
+        sheet = self._sheet_by_id(grid['sheetId'])
+        start, end = grid['startIndex'], grid['endIndex']
+        rows = sheet['rows']
+        if start > len(rows):
+            rows.extend([] for _ in range(start - len(rows)))
+        rows[start:start] = [[] for _ in range(end - start)]
+        sheet['formats'] = {(row + (end - start) if row >= start else row): fmt for row, fmt in sheet['formats'].items()}
+        return {}
+
+    def _apply_updateCells(self, params):
+        start = params['start']
+        sheet = self._sheet_by_id(start['sheetId'])
+        rows = sheet['rows']
+        for offset, row_data in enumerate(params['rows']):
+            index = start['rowIndex'] + offset
+            if index >= len(rows):
+                rows.extend([] for _ in range(index + 1 - len(rows)))
+            row = rows[index]
+            for column, cell in enumerate(row_data.get('values', []), start=start.get('columnIndex', 0)):
+                if column >= len(row):
+                    row.extend([''] * (column + 1 - len(row)))
+                value = cell.get('userEnteredValue', {})
+                row[column] = str(next(iter(value.values()), ''))
+        return {}
+
+    def _apply_repeatCell(self, params):
+        grid = params['range']
+        sheet = self._sheet_by_id(grid['sheetId'])
+        for row in range(grid['startRowIndex'], grid['endRowIndex']):
+            sheet['formats'][row] = params['cell'].get('userEnteredFormat', {})
+        return {}
+
+    def _apply_addConditionalFormatRule(self, params):
+        rule = params['rule']
+        sheet = self._sheet_by_id(rule['ranges'][0]['sheetId'])
+        sheet['conditional_formats'].insert(params.get('index', len(sheet['conditional_formats'])), rule)
+        return {}
+
+    def _apply_updateConditionalFormatRule(self, params):
+        sheet = self._sheet_by_id(params['sheetId'])
+        sheet['conditional_formats'][params['index']] = params['rule']
+        return {}
+
+    def _apply_createDeveloperMetadata(self, params):
+        metadata = dict(params['developerMetadata'], metadataId=self._next_metadata_id)
+        self._next_metadata_id += 1
+        self._sheet_by_id(metadata['location']['sheetId'])['developer_metadata'].append(metadata)
+        return {'createDeveloperMetadata': {'developerMetadata': metadata}}
+
+    def _apply_updateDeveloperMetadata(self, params):
+        ids = {data_filter['developerMetadataLookup']['metadataId'] for data_filter in params['dataFilters']}
+        updated = []
+        for sheet in self.sheets.values():
+            for metadata in sheet['developer_metadata']:
+                if metadata['metadataId'] in ids:
+                    metadata.update(params['developerMetadata'])
+                    updated.append(metadata)
+        return {'updateDeveloperMetadata': {'developerMetadata': updated}}
+
+    def _apply_deleteDeveloperMetadata(self, params):
+        metadata_id = params['dataFilter']['developerMetadataLookup']['metadataId']
+        deleted = []
+        for sheet in self.sheets.values():
+            deleted += [metadata for metadata in sheet['developer_metadata'] if metadata['metadataId'] == metadata_id]
+            sheet['developer_metadata'] = [metadata for metadata in sheet['developer_metadata'] if metadata['metadataId'] != metadata_id]
+        return {'deleteDeveloperMetadata': {'deletedDeveloperMetadata': deleted}}
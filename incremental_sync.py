@@ -0,0 +1,190 @@
+# incremental_sync.py
+import os
+import threading
+import time
+
+from api_scheduler import api_scheduler, READ
+from snapshot_cache import snapshot_cache
+from tracing import traced
+from utils import a1_range, col_index_to_letter, fetch_sheet_values
+
+# Rows just above the known end of a tab that are read again to notice edits, inserts or
+# deletes above the tail
+CHECK_ROWS = 3
+# Seconds after which a tab is read in full again even when its tail looked unchanged
+FULL_RELOAD_AFTER = float(os.environ.get("SHEET_FULL_RELOAD_AFTER", 1800))
+
+
+# Function to cut rows to the sheet width and drop trailing empty cells, as the API returns them
+def normalize_rows(rows, width):
+    normalized = []
+    for row in rows:
+        row = list(row[:width])
+        while row and row[-1] == '':
+            row.pop()
+        normalized.append(row)
+    return normalized
+
+# Function to drop trailing empty rows, which the API leaves out of a range
+def without_trailing_empty(rows):
+    end = len(rows)
+    while end and not rows[end - 1]:
+        end -= 1
+    return rows[:end]
+
+
+# Remembers, for every tab read in full, its row count and its last CHECK_ROWS rows. Later
+# refreshes read only those check rows and the rows below them: if the check rows are
+# unchanged, the new rows are merged into the snapshot with the tab's extend function, so
+# a refresh costs as much as the number of new rows. Otherwise the tab is read in full.
+class IncrementalSync:
+    def __init__(self):
+        self._tabs = {}
+        self._lock = threading.Lock()
+
+    # Function to record the state of a tab that was just read in full
+    def remember(self, spreadsheet_id, sheet_title, values, width):
+        state = {
+            'total_rows': len(values),
+            'check_rows': normalize_rows(values[-CHECK_ROWS:], width),
+            'loaded_at': time.monotonic()
+        }
+        with self._lock:
+            self._tabs[(spreadsheet_id, sheet_title)] = state
+
+    # Function to forget a tab so its next refresh is a full read
+    def forget(self, spreadsheet_id, sheet_title):
+        with self._lock:
+            self._tabs.pop((spreadsheet_id, sheet_title), None)
+
+    # Function to forget every tab
+    def clear(self):
+        with self._lock:
+            self._tabs.clear()
+
+    # Function to get a copy of a tab's state for the snapshot store, or None. The load time
+    # is exported as an age, since monotonic clocks do not survive a restart.
+    def export(self, spreadsheet_id, sheet_title):
+        with self._lock:
+            state = self._tabs.get((spreadsheet_id, sheet_title))
+        if state is None:
+            return None
+        return {'total_rows': state['total_rows'], 'check_rows': list(state['check_rows']),
+                'age': time.monotonic() - state['loaded_at']}
+
+    # Function to adopt a state saved by the snapshot store; `age` is added to its saved age
+    def restore(self, spreadsheet_id, sheet_title, state, age=0.0):
+        restored = {
+            'total_rows': state['total_rows'],
+            'check_rows': state['check_rows'],
+            'loaded_at': time.monotonic() - state['age'] - age
+        }
+        with self._lock:
+            self._tabs[(spreadsheet_id, sheet_title)] = restored
+
+    # Function to replay the row inserts and cell updates of a batchUpdate this process just
+    # wrote on a tab's remembered state, so the written snapshot can be refreshed
+    # incrementally. Returns False (and forgets the tab) when the state does not match
+    # total_rows, the row count the requests were planned against.
+    def record_requests(self, spreadsheet_id, sheet_title, total_rows, requests, width):
+        key = (spreadsheet_id, sheet_title)
+        with self._lock:
+            state = self._tabs.get(key)
+            if state is None or state['total_rows'] != total_rows:
+                self._tabs.pop(key, None)
+                return False
+            # Only the window of check rows at the bottom is tracked
+            window = list(state['check_rows'])
+            window_start = total_rows - len(window)
+            for request in requests:
+                if 'insertDimension' in request and request['insertDimension']['range'].get('dimension') == 'ROWS':
+                    grid = request['insertDimension']['range']
+                    count = grid['endIndex'] - grid['startIndex']
+                    if grid['startIndex'] >= window_start:
+                        position = grid['startIndex'] - window_start
+                        window[position:position] = [[] for _ in range(count)]
+                    else:
+                        window_start += count
+                    total_rows += count
+                elif 'updateCells' in request:
+                    first_row = request['updateCells']['start']['rowIndex']
+                    for offset, row in enumerate(request['updateCells']['rows']):
+                        position = first_row + offset - window_start
+                        if 0 <= position < len(window):
+                            values = [str(next(iter(cell.get('userEnteredValue', {}).values()), '')) for cell in row.get('values', [])]
+                            window[position] = normalize_rows([values], width)[0]
+            self._tabs[key] = dict(state, total_rows=total_rows, check_rows=window[-CHECK_ROWS:])
+            return True
+
+    # Function to refresh several tabs with one batchGet. tabs maps a title to the
+    # (stale snapshot, extend function) pair. Returns {title: new snapshot}, with None for
+    # the tabs that need a full read.
+    @traced("refresh_tails")
+    def refresh(self, service, spreadsheet_id, tabs, background=False, coalesce=True):
+        results = {title: None for title in tabs}
+        plans = {}
+        now = time.monotonic()
+        with self._lock:
+            for title, (snapshot, _) in tabs.items():
+                state = self._tabs.get((spreadsheet_id, title))
+                if (state is not None and state['total_rows'] == snapshot[3] and state['total_rows'] > 0
+                        and now - state['loaded_at'] < FULL_RELOAD_AFTER):
+                    plans[title] = state
+        if not plans:
+            return results
+
+        ranges = []
+        for title, state in plans.items():
+            last_column = col_index_to_letter(len(tabs[title][0][0]) - 1)
+            total_rows = state['total_rows']
+            first_check_row = max(total_rows - CHECK_ROWS + 1, 1)
+            ranges.append(a1_range(title, f"A{first_check_row}:{last_column}{total_rows}"))
+            ranges.append(a1_range(title, f"A{total_rows + 1}:{last_column}"))
+        result = api_scheduler.execute(service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=ranges,
+            valueRenderOption="FORMATTED_VALUE",
+            fields="valueRanges(values)"
+        ), READ, background=background, coalesce=coalesce)
+        value_ranges = result.get('valueRanges', [])
+
+        for position, (title, state) in enumerate(plans.items()):
+            snapshot, extend = tabs[title]
+            width = len(snapshot[0])
+            check_rows = normalize_rows(value_ranges[2 * position].get('values', []), width)
+            if without_trailing_empty(check_rows) != without_trailing_empty(state['check_rows']):
+                continue  # Something above the tail changed: read the tab in full
+            tail = value_ranges[2 * position + 1].get('values', [])
+            if tail:
+                snapshot = extend(snapshot, tail)
+            with self._lock:
+                self._tabs[(spreadsheet_id, title)] = {
+                    'total_rows': snapshot[3],
+                    'check_rows': (state['check_rows'] + normalize_rows(tail, width))[-CHECK_ROWS:],
+                    'loaded_at': state['loaded_at']
+                }
+            results[title] = snapshot
+        return results
+
+
+# Process-wide state shared by every Streamlit session
+incremental_sync = IncrementalSync()
+
+
+# Function to load a tab's snapshot after a cache miss: the stale snapshot is refreshed
+# incrementally when possible, otherwise the tab is read and parsed in full. The result is
+# stored in the snapshot cache. Raises HttpError, or ValueError when the tab does not parse.
+# coalesce=False keeps the reads from joining identical ones already in flight.
+@traced("load_snapshot")
+def load_snapshot(service, spreadsheet_id, sheet_title, parse, extend, coalesce=True):
+    generation = snapshot_cache.generation(spreadsheet_id, sheet_title)
+    snapshot = snapshot_cache.get_stale(spreadsheet_id, sheet_title)
+    if snapshot is not None:
+        snapshot = incremental_sync.refresh(service, spreadsheet_id, {sheet_title: (snapshot, extend)},
+                                            coalesce=coalesce)[sheet_title]
+    if snapshot is None:
+        values = fetch_sheet_values(service, spreadsheet_id, sheet_title, coalesce=coalesce)
+        snapshot = parse(values)
+        incremental_sync.remember(spreadsheet_id, sheet_title, values, len(snapshot[0]))
+    snapshot_cache.put(spreadsheet_id, sheet_title, snapshot, generation=generation)
+    return snapshot
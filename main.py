@@ -1,69 +1,166 @@
 # main.py
+import time
+_script_started = time.perf_counter()
 import streamlit as st
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-from theater_show import display_theater_content, append_theater_row, theater_form
-from video_call import display_video_call_content, append_video_call_row, video_call_form
-from utils import apply_row_formatting, get_sheet_id
+from theater_show import display_theater_content, theater_form
+from theater_rows import parse_theater_values, extend_theater_snapshot
+from video_call import display_video_call_content, video_call_form
+from video_call_rows import parse_video_call_values, extend_video_call_snapshot
+from bulk_import import bulk_import_form
+from batch_entry import batch_entry_form
+from data_viewer import data_viewer
+from analytics import analytics_dashboard
+from sheets_client import SheetsClientManager
+from snapshot_cache import snapshot_cache
+from tab_prefetch import tab_prefetcher
+from incremental_sync import incremental_sync
+from snapshot_store import snapshot_store
+from write_queue import write_queue
+from tracing import tracer, summarize
 import logging
+import os
 
-logging.basicConfig(level=logging.DEBUG)
+# Seconds spent importing the app modules; only the first run of a process imports them
+IMPORT_SECONDS = time.perf_counter() - _script_started
+
+# Application logging only; the httplib2/googleapiclient wire dumps stay off
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
+logging.getLogger("googleapiclient").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+SPREADSHEET_ID = "1J8WJobKJSeDEybF7rdDAB6hoFQCyeKsd8TcgOsMCIlo"
+
+# Configured tabs with their (parse, extend) functions; all of them are prefetched together
+SHEET_LOADERS = {
+    "theater_test": (parse_theater_values, extend_theater_snapshot),
+    "VC 2025_test": (parse_video_call_values, extend_video_call_snapshot)
+}
+
+# Function to create the process-wide client manager (shared by every session and rerun)
+@st.cache_resource
+def get_client_manager():
+    creds_dict = {
+        "type": st.secrets["gcp_service_account"]["type"],
+        "project_id": st.secrets["gcp_service_account"]["project_id"],
+        "private_key_id": st.secrets["gcp_service_account"]["private_key_id"],
+        "private_key": st.secrets["gcp_service_account"]["private_key"],
+        "client_email": st.secrets["gcp_service_account"]["client_email"],
+        "client_id": st.secrets["gcp_service_account"]["client_id"],
+        "auth_uri": st.secrets["gcp_service_account"]["auth_uri"],
+        "token_uri": st.secrets["gcp_service_account"]["token_uri"],
+        "auth_provider_x509_cert_url": st.secrets["gcp_service_account"]["auth_provider_x509_cert_url"],
+        "client_x509_cert_url": st.secrets["gcp_service_account"]["client_x509_cert_url"]
+    }
+    return SheetsClientManager(creds_dict)
 
 # Function to connect to Google Sheets API
 def connect_to_gsheet():
-    SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
     try:
-        creds_dict = {
-            "type": st.secrets["gcp_service_account"]["type"],
-            "project_id": st.secrets["gcp_service_account"]["project_id"],
-            "private_key_id": st.secrets["gcp_service_account"]["private_key_id"],
-            "private_key": st.secrets["gcp_service_account"]["private_key"],
-            "client_email": st.secrets["gcp_service_account"]["client_email"],
-            "client_id": st.secrets["gcp_service_account"]["client_id"],
-            "auth_uri": st.secrets["gcp_service_account"]["auth_uri"],
-            "token_uri": st.secrets["gcp_service_account"]["token_uri"],
-            "auth_provider_x509_cert_url": st.secrets["gcp_service_account"]["auth_provider_x509_cert_url"],
-            "client_x509_cert_url": st.secrets["gcp_service_account"]["client_x509_cert_url"]
-        }
-        
-        # Create credentials object from the dictionary
-        creds = service_account.Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
-        # Build service with cache disabled
-        service = build('sheets', 'v4', credentials=creds, cache_discovery=False)
-        return service
+        return get_client_manager()
     except Exception as e:
         st.error(f"Failed to connect to Google Sheets API: {e}")
         return None
 
+# Function to show the pending/synced state of queued rows in the sidebar
+def write_queue_status(sheet_title):
+    counts = write_queue.counts(SPREADSHEET_ID, sheet_title)
+    st.sidebar.subheader("Sync status")
+    st.sidebar.write(f"Pending: {counts['pending']} | Synced: {counts['synced']} | Failed: {counts['failed']}")
+    for entry in write_queue.recent(SPREADSHEET_ID, sheet_title, limit=5):
+        message = f"{entry['status']}: {' | '.join(entry['row'][:3])}"
+        if entry['last_error']:
+            message += f" ({entry['last_error']})"
+        st.sidebar.caption(message)
+    if counts['failed'] and st.sidebar.button("Retry failed rows"):
+        write_queue.retry_failed(SPREADSHEET_ID, sheet_title)
+
+# Function to show this rerun's traced operations and totals in the sidebar
+def trace_panel():
+    if not tracer.enabled:
+        return
+    records = tracer.rerun_records()
+    totals = summarize(records)
+    with st.sidebar.expander("Performance trace", expanded=False):
+        st.write(f"Rerun: {totals['total_ms']:.1f} ms | API calls: {totals['api_calls']} "
+                 f"({totals['api_ms']:.1f} ms, {totals['api_bytes']} bytes, {totals['retries']} retries)")
+        if tracer.startup:
+            st.write(f"Cold start: imports {tracer.startup['import_ms']:.1f} ms | first render {tracer.startup['first_render_ms']:.1f} ms")
+        st.dataframe(
+            [{key: entry.get(key) for key in ('operation', 'ms', 'depth', 'bytes', 'retries', 'wait_ms', 'status', 'coalesced')}
+             for entry in records],
+            use_container_width=True
+        )
+        st.download_button("Export trace (JSON lines)", tracer.export_jsonl(), file_name="sheets_trace.jsonl", mime="application/jsonl")
+
 # Main Streamlit app function
 def main():
     st.title("Alamanda Google Sheet Updater")
+    # Per session: the checkbox only traces this session's reruns
+    tracer.begin_rerun(enabled=st.sidebar.checkbox("Trace API calls", value=tracer.default_enabled, help="Record every Sheets call and parse step"))
 
     # Sidebar for sheet selection
-    sheet_options = ["theater_test", "VC 2025_test"]
+    sheet_options = list(SHEET_LOADERS)
     selected_sheet = st.sidebar.selectbox("Select Sheet", sheet_options)
 
+    # Manual refresh drops the cached snapshot so the tab is read again in full
+    refreshed = st.sidebar.button("Refresh data")
+    if refreshed:
+        snapshot_cache.invalidate(SPREADSHEET_ID, selected_sheet)
+        incremental_sync.forget(SPREADSHEET_ID, selected_sheet)
+
     # Connect to the Google Sheet
-    service = connect_to_gsheet()
-    if not service:
+    manager = connect_to_gsheet()
+    if not manager:
         return
 
-    spreadsheet_id = "1J8WJobKJSeDEybF7rdDAB6hoFQCyeKsd8TcgOsMCIlo"
-    sheet_title = selected_sheet
+    # Background worker that drains the write queue to the sheet
+    write_queue.start(manager)
+    write_queue_status(selected_sheet)
+
+    # Tabs saved by an earlier run or another worker render from disk and are revalidated below;
+    # a tab the user just refreshed is read from the sheet instead
+    restored = snapshot_store.restore(SPREADSHEET_ID, [title for title in SHEET_LOADERS
+                                                       if not (refreshed and title == selected_sheet)])
+
+    # Lease a pooled service for this rerun; the transport goes back to the pool afterwards
+    with manager.lease() as service, tracer.span(f"render {selected_sheet}"):
+        # One batchGet loads every tab that is not cached; only the selected one is waited for
+        tab_prefetcher.load(service, SPREADSHEET_ID, SHEET_LOADERS, wait_for=selected_sheet)
+        render_sheet(manager, service, selected_sheet)
 
-    # Initialize event_colors in session state if not present
-    if "event_colors" not in st.session_state:
-        st.session_state.event_colors = {}
+    # Re-read restored snapshots and those nearing expiry in the background, then save the
+    # changed ones for the next start and the other workers
+    tab_prefetcher.revalidate(manager, SPREADSHEET_ID, {title: SHEET_LOADERS[title] for title in restored})
+    tab_prefetcher.keep_warm(manager, SPREADSHEET_ID, SHEET_LOADERS)
+    snapshot_store.save_async(SPREADSHEET_ID, SHEET_LOADERS)
+
+    trace_panel()
+
+# Function to render the selected sheet and its input form
+def render_sheet(manager, service, selected_sheet):
+    spreadsheet_id = SPREADSHEET_ID
+    sheet_title = selected_sheet
 
     # Display sheet content and handle row addition based on selected sheet
     if selected_sheet == "theater_test":
         headers, data, month_sections, total_rows = display_theater_content(service, spreadsheet_id, sheet_title)
         if headers:
+            data_viewer(manager, service, spreadsheet_id, sheet_title, headers, month_sections, total_rows)
+            analytics_dashboard(spreadsheet_id, sheet_title, headers, data)
             theater_form(service, spreadsheet_id, sheet_title, headers, data, month_sections, total_rows)
+            batch_entry_form(service, spreadsheet_id, sheet_title, headers, data, month_sections, total_rows)
+            bulk_import_form(service, spreadsheet_id, sheet_title, headers, data, month_sections, total_rows)
     else:  # Video Call
         headers, data, month_sections, total_rows = display_video_call_content(service, spreadsheet_id, sheet_title)
         if headers:
+            data_viewer(manager, service, spreadsheet_id, sheet_title, headers, month_sections, total_rows)
+            analytics_dashboard(spreadsheet_id, sheet_title, headers, data)
             video_call_form(service, spreadsheet_id, sheet_title, headers, data, month_sections, total_rows)
+            batch_entry_form(service, spreadsheet_id, sheet_title, headers, data, month_sections, total_rows)
+            bulk_import_form(service, spreadsheet_id, sheet_title, headers, data, month_sections, total_rows)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
+    # Cold start of this process: the imports above and the first full rerun
+    if tracer.record_startup(IMPORT_SECONDS, time.perf_counter() - _script_started - IMPORT_SECONDS):
+        logger.info("Cold start: imports %.0f ms, first render %.0f ms", tracer.startup['import_ms'], tracer.startup['first_render_ms'])
\ No newline at end of file
@@ -0,0 +1,104 @@
+# month_index.py
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Mapping
+
+
+# Index of the month sections of a sheet. It maps a section title (e.g. "Januari 2025")
+# to its {'start_row', 'row_count', 'key'} dict like the plain dict it replaces, and also keeps
+#  - the sections ordered by their (year, month) key, to find where a new month belongs
+#  - the sections ordered by start row, to shift the ones below an insert
+# start_row is the 1-based row of the section title; its header row follows it, then
+# row_count data rows.
+class MonthIndex(Mapping):
+    def __init__(self):
+        self._sections = {}
+        self._keys = []
+        self._starts = []
+        self._start_titles = []
+
+    def __getitem__(self, title):
+        return self._sections[title]
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+    # Function to register a section title found at start_row; key is (year, month) or None
+    def add_section(self, title, start_row, key=None):
+        if title in self._sections:
+            self._remove(title)
+        section = {'start_row': start_row, 'row_count': 0, 'key': key}
+        self._sections[title] = section
+        if key is not None:
+            insort(self._keys, (key, title))
+        position = bisect_right(self._starts, start_row)
+        self._starts.insert(position, start_row)
+        self._start_titles.insert(position, title)
+        return section
+
+    # Function to drop a section (a repeated title replaces the earlier one, like a dict)
+    def _remove(self, title):
+        section = self._sections.pop(title)
+        if section['key'] is not None:
+            self._keys.remove((section['key'], title))
+        position = self._start_titles.index(title)
+        del self._starts[position]
+        del self._start_titles[position]
+
+    # Function to get the number of data rows in a section (0 for an unknown title)
+    def row_count(self, title):
+        section = self._sections.get(title)
+        return section['row_count'] if section else 0
+
+    # Function to get the title of the section lowest in the sheet (where new bottom rows belong)
+    def last_title(self):
+        return self._start_titles[-1] if self._start_titles else None
+
+    # Function to get the sections in chronological order
+    def ordered_titles(self):
+        return [title for _, title in self._keys]
+
+    # Function to find the section a (year, month) key belongs to, by binary search
+    def find(self, key):
+        position = bisect_left(self._keys, (key,))
+        if position < len(self._keys) and self._keys[position][0] == key:
+            return self._keys[position][1]
+        return None
+
+    # Function to answer "where does this month go": the 0-based row index to insert at,
+    # and whether a new section (title and header rows) has to be created there
+    def insertion_point(self, title, key, total_rows):
+        section = self._sections.get(title)
+        if section is not None:
+            return section['start_row'] + section['row_count'] + 1, False
+
+        # A new month goes right before the title row of the first later month
+        if key is not None:
+            position = bisect_left(self._keys, (key,))
+            if position < len(self._keys):
+                successor = self._sections[self._keys[position][1]]
+                return successor['start_row'] - 1, True
+        return total_rows, True
+
+    # Function to record count rows inserted at the 0-based insert_index: sections below
+    # are shifted, and data_rows of them are counted in their (possibly new) section
+    def record_insert(self, insert_index, count, title, data_rows, key=None, new_section=False):
+        position = bisect_right(self._starts, insert_index)
+        for i in range(position, len(self._starts)):
+            self._starts[i] += count
+            self._sections[self._start_titles[i]]['start_row'] += count
+
+        if new_section:
+            self.add_section(title, insert_index + 1, key)
+        self._sections[title]['row_count'] += data_rows
+
+    # Function to copy the index so a batch of inserts can be planned without touching the original
+    def copy(self):
+        index = MonthIndex()
+        index._sections = {title: dict(section) for title, section in self._sections.items()}
+        index._keys = list(self._keys)
+        index._starts = list(self._starts)
+        index._start_titles = list(self._start_titles)
+        return index
@@ -0,0 +1,176 @@
+# row_import.py
+# Reading, validating and planning the insert of many rows at once, shared by the bulk
+# import panel (bulk_import.py), the write queue and the command line (cli.py). Nothing
+# here uses streamlit.
+import csv
+import io
+from datetime import date, datetime
+
+from utils import validate_date, pad_row, insert_rows_request, update_cells_request, row_format_request
+from theater_rows import EXPECTED_HEADERS as THEATER_HEADERS, get_month_year, month_key
+from video_call_rows import format_date_indonesian
+from tracing import traced
+
+# Upper bound of cells written by one batchUpdate, and of rows inserted by one request
+MAX_CELLS_PER_BATCH = 20000
+MAX_ROWS_PER_BLOCK = 1000
+
+# Function to turn a CSV/XLSX cell into the text we store in the sheet
+def cell_to_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%d/%m/%Y")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+# Function to read the rows of an uploaded CSV or XLSX file as lists of strings. Blank rows
+# are dropped. Returns the rows and the file line each starts on (the worksheet row for XLSX).
+@traced("read_uploaded_rows")
+def read_uploaded_rows(uploaded_file):
+    if uploaded_file.name.lower().endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("Reading XLSX files requires the openpyxl package.")
+        workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+        numbered_rows = enumerate(workbook.active.iter_rows(values_only=True), start=1)
+    else:
+        reader = csv.reader(io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline=''))
+        # A quoted cell may span lines, so a record starts on the line after the previous one ended
+        def csv_rows():
+            line = 1
+            for row in reader:
+                yield line, row
+                line = reader.line_num + 1
+        numbered_rows = csv_rows()
+
+    rows = []
+    lines = []
+    for line, row in numbered_rows:
+        row = [cell_to_text(value) for value in row]
+        if any(row):
+            rows.append(row)
+            lines.append(line)
+    return rows, lines
+
+# Function to drop the header line of the file if it repeats the sheet headers. Returns the
+# rows and their line numbers.
+def strip_header(rows, lines, headers):
+    if rows and rows[0][:len(headers)] == headers:
+        return rows[1:], lines[1:]
+    return rows, lines
+
+# Function to validate theater rows against each other and the existing data (a RowStore).
+# `taken` holds further numbers already in use (e.g. rows still in the write queue).
+# `lines` are the file lines of the rows, used in the messages; without them rows are
+# numbered from 1. Returns the valid rows and a list of error messages.
+def validate_theater_rows(rows, data, taken=(), lines=None):
+    width = len(THEATER_HEADERS)
+    seen_nos = set()
+    valid_rows = []
+    errors = []
+    for line, row in zip(lines or range(1, len(rows) + 1), rows):
+        row = pad_row(row, width)[:width]
+        no, tanggal = row[0], row[1]
+        if not all(row):
+            errors.append(f"Line {line}: all fields are required.")
+        elif not no.isdigit():
+            errors.append(f"Line {line}: NO '{no}' must be a number.")
+        elif data.has_key(no) or no in seen_nos or no in taken:
+            errors.append(f"Line {line}: NO '{no}' already exists.")
+        elif not validate_date(tanggal):
+            errors.append(f"Line {line}: Tanggal '{tanggal}' must be in DD/MM/YYYY format with valid date.")
+        else:
+            seen_nos.add(no)
+            valid_rows.append(row)
+    return valid_rows, errors
+
+# Function to validate Video Call rows and format their dates the way the form does.
+# `lines` are the file lines of the rows, as for validate_theater_rows.
+def validate_video_call_rows(rows, headers, lines=None):
+    width = len(headers)
+    valid_rows = []
+    errors = []
+    for line, row in zip(lines or range(1, len(rows) + 1), rows):
+        row = pad_row(row, width)[:width]
+        if not all(row):
+            errors.append(f"Line {line}: all fields are required.")
+        elif not validate_date(row[2]):
+            errors.append(f"Line {line}: Tanggal '{row[2]}' must be in DD/MM/YYYY format with valid date.")
+        else:
+            row[2] = format_date_indonesian(row[2])
+            valid_rows.append(row)
+    return valid_rows, errors
+
+# Function to split rows into slices no longer than MAX_ROWS_PER_BLOCK
+def slice_rows(rows):
+    return [rows[i:i + MAX_ROWS_PER_BLOCK] for i in range(0, len(rows), MAX_ROWS_PER_BLOCK)]
+
+# Function to build the insert blocks for theater rows, grouped under their month sections.
+# Each block is (requests, data_rows, inserted_rows). Positions are planned on a copy of the
+# month index that is shifted after every block, so the blocks must be written in order.
+# Pass `index` to plan on (and keep) a month index of your own instead of the copy.
+@traced("build_theater_import_blocks")
+def build_theater_import_blocks(sheet_id, headers, month_sections, total_rows, rows, index=None):
+    width = len(headers)
+    groups = {}
+    for row in rows:
+        groups.setdefault(get_month_year(row[1]), []).append(row)
+
+    if index is None:
+        index = month_sections.copy()
+    blocks = []
+    for month_year in sorted(groups, key=month_key):
+        key = month_key(month_year)
+        for rows_slice in slice_rows(groups[month_year]):
+            insert_index, new_section = index.insertion_point(month_year, key, total_rows)
+            if new_section:
+                values = [pad_row([month_year], width), headers] + rows_slice
+                requests = [
+                    insert_rows_request(sheet_id, insert_index, len(values)),
+                    update_cells_request(sheet_id, insert_index, values),
+                    row_format_request(sheet_id, insert_index + 1, width, is_header=False),
+                    row_format_request(sheet_id, insert_index + 2, width, is_header=True)
+                ]
+            else:
+                values = rows_slice
+                requests = [
+                    insert_rows_request(sheet_id, insert_index, len(values)),
+                    update_cells_request(sheet_id, insert_index, values)
+                ]
+            index.record_insert(insert_index, len(values), month_year, len(rows_slice), key=key, new_section=new_section)
+            total_rows += len(values)
+            blocks.append((requests, len(rows_slice), len(values)))
+
+    return blocks
+
+# Function to build the insert blocks for Video Call rows, appended after the last row.
+# Rows need no formatting requests: the event color rules color them.
+def build_video_call_import_blocks(sheet_id, total_rows, rows):
+    blocks = []
+    next_index = total_rows
+    for rows_slice in slice_rows(rows):
+        requests = [
+            insert_rows_request(sheet_id, next_index, len(rows_slice)),
+            update_cells_request(sheet_id, next_index, rows_slice)
+        ]
+        blocks.append((requests, len(rows_slice), len(rows_slice)))
+        next_index += len(rows_slice)
+    return blocks
+
+# Function to pack blocks into batchUpdate chunks bounded by MAX_CELLS_PER_BATCH
+def chunk_blocks(blocks, width):
+    chunks = []
+    current = {'requests': [], 'rows': 0, 'inserted': 0}
+    for requests, data_rows, inserted_rows in blocks:
+        if current['requests'] and (current['inserted'] + inserted_rows) * width > MAX_CELLS_PER_BATCH:
+            chunks.append(current)
+            current = {'requests': [], 'rows': 0, 'inserted': 0}
+        current['requests'].extend(requests)
+        current['rows'] += data_rows
+        current['inserted'] += inserted_rows
+    if current['requests']:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,87 @@
+# row_store.py
+from collections.abc import Sequence
+
+
+# Compact store for the data rows of a parsed sheet. Values are kept column by column
+# (one list per column instead of one list per row), repeated values of the shared
+# columns point at one string object, and a hash index on the key column (NO) makes
+# duplicate checks and the next-number suggestion O(1) instead of a scan of every row.
+# Rows are only ever added at the end, so a copy extended with new rows keeps the rows of
+# its origin as a prefix; such stores share a `lineage` token.
+class RowStore(Sequence):
+    __slots__ = ('headers', 'max_key', 'lineage', '_columns', '_shared', '_pool', '_key_column', '_keys')
+
+    def __init__(self, headers, key_column=None, shared_columns=()):
+        self.headers = headers
+        self.max_key = 0  # Largest numeric key seen so far
+        self.lineage = object()
+        self._columns = [[] for _ in headers]
+        self._shared = tuple(i in shared_columns for i in range(len(headers)))
+        self._pool = {}
+        self._key_column = key_column
+        self._keys = set()
+
+    def __len__(self):
+        return len(self._columns[0]) if self._columns else 0
+
+    # Rows are rebuilt on access, so callers can keep indexing and iterating like a list of lists
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return [column[index] for column in self._columns]
+
+    # Function to add a row (padded with '' when short)
+    def append(self, row):
+        self.extend([row])
+
+    # Function to add many rows at once; the rows are transposed into the columns in bulk
+    def extend(self, rows):
+        width = len(self._columns)
+        rows = [row if len(row) >= width else list(row) + [''] * (width - len(row)) for row in rows]
+        if not rows or not width:
+            return
+        pool = self._pool
+        for column, shared, values in zip(self._columns, self._shared, zip(*rows)):
+            column.extend(map(pool.setdefault, values, values) if shared else values)
+
+        if self._key_column is not None:
+            keys = self._columns[self._key_column][-len(rows):]
+            self._keys.update(keys)
+            self.max_key = max([self.max_key] + [int(key) for key in keys if key.isdigit()])
+
+    # Function to copy the store so rows can be added without touching a shared snapshot.
+    # The column lists are copied; the value pool is append-only and stays shared.
+    def copy(self):
+        store = RowStore.__new__(RowStore)
+        store.headers = self.headers
+        store.max_key = self.max_key
+        store.lineage = self.lineage
+        store._columns = [list(column) for column in self._columns]
+        store._shared = self._shared
+        store._pool = self._pool
+        store._key_column = self._key_column
+        store._keys = set(self._keys)
+        return store
+
+    # Pickling (the snapshot store) leaves the value pool out: it is shared by every copy in
+    # the lineage, may be growing on another thread and holds values no longer in this store.
+    # Loading rebuilds it from this store's shared columns.
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != '_pool'}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        pool = {}
+        for column, shared in zip(self._columns, self._shared):
+            if shared:
+                column[:] = map(pool.setdefault, column, column)
+        self._pool = pool
+
+    # Function to get all values of one column
+    def column(self, index):
+        return self._columns[index]
+
+    # Function to check whether a key (e.g. a NO) is already taken
+    def has_key(self, key):
+        return key in self._keys
@@ -0,0 +1,79 @@
+# sheet_metadata.py
+import threading
+
+from api_scheduler import api_scheduler, READ
+
+# Only the tab properties we use; the rest of the spreadsheet resource is never downloaded
+PROPERTIES_FIELDS = "sheets.properties(sheetId,title,gridProperties(rowCount,columnCount,frozenRowCount))"
+
+
+# Registry caching title -> sheetId, grid size and frozen rows for each spreadsheet.
+# It is filled with one field-masked get and refreshed only on a miss or when
+# invalidated after a structural change made outside this process.
+class SheetMetadataRegistry:
+    def __init__(self):
+        self._spreadsheets = {}
+        self._lock = threading.Lock()
+
+    # Function to fetch the properties of every tab in one field-masked request
+    def refresh(self, service, spreadsheet_id):
+        spreadsheet = api_scheduler.execute(service.spreadsheets().get(
+            spreadsheetId=spreadsheet_id,
+            fields=PROPERTIES_FIELDS
+        ), READ)
+        sheets = {}
+        for sheet in spreadsheet.get('sheets', []):
+            properties = sheet['properties']
+            grid = properties.get('gridProperties', {})
+            sheets[properties['title']] = {
+                'sheet_id': properties['sheetId'],
+                'row_count': grid.get('rowCount', 0),
+                'column_count': grid.get('columnCount', 0),
+                'frozen_rows': grid.get('frozenRowCount', 0)
+            }
+        with self._lock:
+            self._spreadsheets[spreadsheet_id] = sheets
+        return sheets
+
+    # Function to return a tab's properties, fetching them only on a miss
+    def get(self, service, spreadsheet_id, sheet_title):
+        with self._lock:
+            properties = self._spreadsheets.get(spreadsheet_id, {}).get(sheet_title)
+        if properties is None:
+            properties = self.refresh(service, spreadsheet_id).get(sheet_title)
+        return properties
+
+    # Function to look up a tab's title by sheetId without any request
+    def find_title_by_id(self, spreadsheet_id, sheet_id):
+        with self._lock:
+            for title, properties in self._spreadsheets.get(spreadsheet_id, {}).items():
+                if properties['sheet_id'] == sheet_id:
+                    return title
+        return None
+
+    # Function to record rows this process inserted, so the grid size stays current
+    def add_rows(self, spreadsheet_id, sheet_title, count):
+        with self._lock:
+            properties = self._spreadsheets.get(spreadsheet_id, {}).get(sheet_title)
+            if properties is not None:
+                properties['row_count'] += count
+
+    # Function to get a copy of a tab's cached properties for the snapshot store, or None
+    def export(self, spreadsheet_id, sheet_title):
+        with self._lock:
+            properties = self._spreadsheets.get(spreadsheet_id, {}).get(sheet_title)
+            return None if properties is None else dict(properties)
+
+    # Function to adopt properties saved by the snapshot store, unless the tab is known already
+    def restore(self, spreadsheet_id, sheet_title, properties):
+        with self._lock:
+            self._spreadsheets.setdefault(spreadsheet_id, {}).setdefault(sheet_title, dict(properties))
+
+    # Function to forget a spreadsheet after tabs were added, renamed or resized elsewhere
+    def invalidate(self, spreadsheet_id):
+        with self._lock:
+            self._spreadsheets.pop(spreadsheet_id, None)
+
+
+# Process-wide registry shared by every Streamlit session
+sheet_registry = SheetMetadataRegistry()
@@ -0,0 +1,108 @@
+# sheet_writer.py
+import threading
+
+from googleapiclient.errors import HttpError
+
+from api_scheduler import api_scheduler, WRITE
+from incremental_sync import incremental_sync, load_snapshot
+from sheet_metadata import sheet_registry
+from snapshot_cache import snapshot_cache
+from tracing import traced
+
+# Attempts of one write; a 400 usually means the positions were planned on a stale sheet
+MAX_ATTEMPTS = 2
+
+
+# Lock that lets waiting threads in strictly in arrival order
+class FairLock:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+
+    def __enter__(self):
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while ticket != self._serving:
+                self._cond.wait()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        with self._cond:
+            self._serving += 1
+            self._cond.notify_all()
+
+
+# Coordinates every write to a tab in this process. Writers queue on a per-tab lock in
+# arrival order; inside it the current state is checked with a range probe (the check rows
+# and the tail, see incremental_sync) instead of a full read, the requests are planned on
+# that state and written, and the written rows are replayed on the cached snapshot so the
+# next writer's probe stays cheap.
+class SheetWriter:
+    def __init__(self):
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    # Function to get the lock that orders the writes to a tab
+    def lock(self, spreadsheet_id, sheet_title):
+        with self._locks_lock:
+            return self._locks.setdefault((spreadsheet_id, sheet_title), FairLock())
+
+    # Function to get the current snapshot of a tab; call it while holding the tab's lock.
+    # Its reads are sent on their own: an identical read already in flight (a page load)
+    # may have started before the last write and would miss its rows.
+    def current(self, service, spreadsheet_id, sheet_title, parse, extend):
+        return load_snapshot(service, spreadsheet_id, sheet_title, parse, extend, coalesce=False)
+
+    # Function to write requests planned on `snapshot`; call it while holding the tab's lock.
+    # `written` is the snapshot after the write, or None when the caller cannot build it
+    # (the tab is then read again on the next access).
+    def commit(self, service, spreadsheet_id, sheet_title, snapshot, requests, written=None):
+        try:
+            response = api_scheduler.execute(service.spreadsheets().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={"requests": requests}
+            ), WRITE)
+        except HttpError as e:
+            if e.resp.status == 400:
+                # e.g. "No grid with id": the tab may have been deleted or recreated, so the
+                # next plan looks its sheetId up again
+                sheet_registry.invalidate(spreadsheet_id)
+            raise
+
+        snapshot_cache.expire(spreadsheet_id, sheet_title)
+        recorded = incremental_sync.record_requests(spreadsheet_id, sheet_title, snapshot[3], requests, len(snapshot[0]))
+        if written is not None and recorded:
+            snapshot_cache.put(spreadsheet_id, sheet_title, written, generation=snapshot_cache.generation(spreadsheet_id, sheet_title))
+        elif written is None:
+            incremental_sync.forget(spreadsheet_id, sheet_title)
+        inserted = sum(request['insertDimension']['range']['endIndex'] - request['insertDimension']['range']['startIndex']
+                       for request in requests if 'insertDimension' in request)
+        sheet_registry.add_rows(spreadsheet_id, sheet_title, inserted)
+        return response
+
+    # Function to append under the tab's lock. plan(snapshot) returns (requests, written,
+    # outcome) for the current snapshot; it runs again when the write is rejected as stale,
+    # so it should look the sheetId up itself (get_sheet_id) rather than capture it.
+    # Returns the outcome and the batchUpdate response (None when there was nothing to write).
+    @traced("coordinated_write")
+    def append(self, service, spreadsheet_id, sheet_title, parse, extend, plan):
+        with self.lock(spreadsheet_id, sheet_title):
+            for attempt in range(MAX_ATTEMPTS):
+                snapshot = self.current(service, spreadsheet_id, sheet_title, parse, extend)
+                requests, written, outcome = plan(snapshot)
+                if not requests:
+                    return outcome, None
+                try:
+                    return outcome, self.commit(service, spreadsheet_id, sheet_title, snapshot, requests, written)
+                except HttpError as e:
+                    if e.resp.status != 400 or attempt == MAX_ATTEMPTS - 1:
+                        raise
+                    # Conflict: the sheet changed in a way the probe missed; plan again on a full read
+                    snapshot_cache.invalidate(spreadsheet_id, sheet_title)
+                    incremental_sync.forget(spreadsheet_id, sheet_title)
+
+
+# Process-wide writer shared by every Streamlit session and the write-queue worker
+sheet_writer = SheetWriter()
@@ -0,0 +1,85 @@
+# sheets_api.py
+import json
+from urllib.parse import quote, urlencode
+
+from googleapiclient.errors import HttpError
+
+BASE_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+
+
+# Function to encode query parameters the way the discovery client does (lists repeat the
+# key, booleans are lowercase, alt=json comes last)
+def encode_query(params):
+    pairs = []
+    for key, value in params.items():
+        if value is None:
+            continue
+        for item in (value if isinstance(value, (list, tuple)) else [value]):
+            pairs.append((key, str(item).lower() if isinstance(item, bool) else str(item)))
+    pairs.append(('alt', 'json'))
+    return urlencode(pairs)
+
+
+# One Sheets API call. It has the attributes of googleapiclient.http.HttpRequest that the
+# scheduler and tracing use (method, uri, body, methodId) and raises the same HttpError.
+class SheetsRequest:
+    def __init__(self, http, method, method_id, uri, body=None):
+        self.http = http
+        self.method = method
+        self.methodId = method_id
+        self.uri = uri
+        self.body = body
+        self.headers = {'accept': 'application/json', 'accept-encoding': 'gzip, deflate'}
+        if body is not None:
+            self.headers['content-type'] = 'application/json'
+
+    # Function to send the request and decode the JSON response. num_retries is accepted for
+    # compatibility and ignored: retries and backoff are the scheduler's job.
+    def execute(self, http=None, num_retries=0):
+        resp, content = (http or self.http).request(self.uri, method=self.method, body=self.body, headers=self.headers)
+        if resp.status >= 300:
+            raise HttpError(resp, content, uri=self.uri)
+        return json.loads(content.decode('utf-8')) if content else {}
+
+
+# spreadsheets.values: the value reads
+class ValuesResource:
+    def __init__(self, http):
+        self._http = http
+
+    def get(self, spreadsheetId, range, **params):
+        uri = f"{BASE_URL}/{quote(spreadsheetId, safe='')}/values/{quote(range, safe='')}?{encode_query(params)}"
+        return SheetsRequest(self._http, 'GET', 'sheets.spreadsheets.values.get', uri)
+
+    def batchGet(self, spreadsheetId, **params):
+        uri = f"{BASE_URL}/{quote(spreadsheetId, safe='')}/values:batchGet?{encode_query(params)}"
+        return SheetsRequest(self._http, 'GET', 'sheets.spreadsheets.values.batchGet', uri)
+
+
+# spreadsheets: metadata reads and batchUpdate
+class SpreadsheetsResource:
+    def __init__(self, http):
+        self._http = http
+
+    def get(self, spreadsheetId, **params):
+        uri = f"{BASE_URL}/{quote(spreadsheetId, safe='')}?{encode_query(params)}"
+        return SheetsRequest(self._http, 'GET', 'sheets.spreadsheets.get', uri)
+
+    def batchUpdate(self, spreadsheetId, body, **params):
+        uri = f"{BASE_URL}/{quote(spreadsheetId, safe='')}:batchUpdate?{encode_query(params)}"
+        return SheetsRequest(self._http, 'POST', 'sheets.spreadsheets.batchUpdate', uri, body=json.dumps(body))
+
+    def values(self):
+        return ValuesResource(self._http)
+
+
+# Hand-written client for the four Sheets v4 endpoints the app calls (spreadsheets.get,
+# spreadsheets.batchUpdate, values.get, values.batchGet). It is a drop-in for
+# build('sheets', 'v4', http=http): building it loads no discovery document and imports
+# nothing from googleapiclient beyond its errors.
+class SheetsService:
+    def __init__(self, http):
+        self._http = http
+
+    def spreadsheets(self):
+        return SpreadsheetsResource(self._http)
@@ -0,0 +1,72 @@
+# sheets_client.py
+import os
+import threading
+from contextlib import contextmanager
+
+from sheets_api import SheetsService
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+# SHEETS_API_CLIENT=discovery builds the googleapiclient discovery client instead of the
+# hand-written one (same requests, slower to import and to build requests with)
+USE_DISCOVERY_CLIENT = os.environ.get("SHEETS_API_CLIENT", "") == "discovery"
+
+# Default number of HTTP transports kept open for concurrent Streamlit sessions
+DEFAULT_POOL_SIZE = 4
+# Socket timeout (seconds) for each pooled transport
+DEFAULT_TIMEOUT = 30
+
+
+# Process-wide manager that shares one set of credentials and keeps a pool of
+# authorized, keep-alive HTTP transports. httplib2 is not thread-safe, so each
+# Streamlit session leases its own service object for the length of a rerun.
+# The auth and transport libraries are imported when the first manager is created, not
+# when this module is imported.
+class SheetsClientManager:
+    def __init__(self, creds_info, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        from google.oauth2 import service_account
+        self.credentials = service_account.Credentials.from_service_account_info(creds_info, scopes=SCOPES)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    # Function to build a service bound to a fresh keep-alive transport
+    def _build_service(self):
+        import httplib2
+        import google_auth_httplib2
+        http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=self.timeout))
+        if USE_DISCOVERY_CLIENT:
+            from googleapiclient.discovery import build
+            return build('sheets', 'v4', http=http, cache_discovery=False, static_discovery=True)
+        return SheetsService(http)
+
+    # Function to refresh the shared token once, instead of once per transport
+    def _ensure_fresh_credentials(self):
+        if self.credentials.valid:
+            return
+        import httplib2
+        import google_auth_httplib2
+        with self._refresh_lock:
+            if not self.credentials.valid:
+                self.credentials.refresh(google_auth_httplib2.Request(httplib2.Http(timeout=self.timeout)))
+
+    # Function to borrow a service from the pool; it is returned when the block exits
+    @contextmanager
+    def lease(self):
+        self._slots.acquire()
+        service = None
+        try:
+            with self._lock:
+                if self._idle:
+                    service = self._idle.pop()
+            if service is None:
+                service = self._build_service()
+            self._ensure_fresh_credentials()
+            yield service
+        finally:
+            if service is not None:
+                with self._lock:
+                    self._idle.append(service)
+            self._slots.release()
@@ -0,0 +1,93 @@
+# snapshot_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds a parsed snapshot stays fresh, and how many sheets are kept at most
+DEFAULT_TTL = float(os.environ.get("SHEET_CACHE_TTL", 300))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("SHEET_CACHE_SIZE", 16))
+
+
+# Thread-safe LRU cache of parsed sheet snapshots keyed by (spreadsheet_id, sheet_title).
+# A snapshot is the (headers, data, month_sections, total_rows) tuple built by the
+# display functions; it is shared between sessions and must be treated as read-only.
+class SnapshotCache:
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._epoch = 0  # Advanced by clear()
+        self._lock = threading.Lock()
+
+    # Function to return a fresh snapshot, or None on a miss or after the TTL
+    def get(self, spreadsheet_id, sheet_title):
+        key = (spreadsheet_id, sheet_title)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, snapshot = entry
+            if time.monotonic() - stored_at > self.ttl:
+                return None  # Kept until evicted, as the base of an incremental refresh
+            self._entries.move_to_end(key)
+            return snapshot
+
+    # Function to return the last snapshot stored for a sheet, fresh or not, or None
+    def get_stale(self, spreadsheet_id, sheet_title):
+        with self._lock:
+            entry = self._entries.get((spreadsheet_id, sheet_title))
+        return None if entry is None else entry[1]
+
+    # Function to get the seconds since a snapshot was stored, or None when there is none
+    def age(self, spreadsheet_id, sheet_title):
+        with self._lock:
+            entry = self._entries.get((spreadsheet_id, sheet_title))
+        return None if entry is None else time.monotonic() - entry[0]
+
+    # Function to get a sheet's generation, which invalidate() and expire() advance. A reader that
+    # passes the generation it started from to put() cannot store a snapshot a write made stale.
+    def generation(self, spreadsheet_id, sheet_title):
+        with self._lock:
+            return self._epoch, self._generations.get((spreadsheet_id, sheet_title), 0)
+
+    # Function to store a snapshot, evicting the least recently used entries.
+    # Returns False (and stores nothing) when the sheet was invalidated since `generation`.
+    def put(self, spreadsheet_id, sheet_title, snapshot, generation=None):
+        key = (spreadsheet_id, sheet_title)
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(key, 0)):
+                return False
+            self._entries[key] = (time.monotonic(), snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    # Function to drop a sheet's snapshot (after a write or a manual refresh)
+    def invalidate(self, spreadsheet_id, sheet_title):
+        key = (spreadsheet_id, sheet_title)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    # Function to mark a sheet's snapshot stale after a write. Unlike invalidate() the
+    # snapshot is kept, so the next read can refresh it incrementally.
+    def expire(self, spreadsheet_id, sheet_title):
+        key = (spreadsheet_id, sheet_title)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (float('-inf'), entry[1])
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    # Function to drop every snapshot
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+
+# Process-wide cache shared by every Streamlit session
+snapshot_cache = SnapshotCache()
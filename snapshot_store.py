@@ -0,0 +1,169 @@
+# snapshot_store.py
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from snapshot_cache import snapshot_cache
+from incremental_sync import incremental_sync
+from sheet_metadata import sheet_registry
+from event_colors import event_color_registry
+
+# Store location, and the age (seconds) past which a saved snapshot is not restored
+DEFAULT_STORE_PATH = os.environ.get("SNAPSHOT_STORE_PATH", "snapshots.db")
+MAX_RESTORE_AGE = float(os.environ.get("SNAPSHOT_MAX_AGE", 24 * 3600))
+# Layout of the saved payload; rows saved with another format are ignored. Bump it whenever
+# the snapshot classes (RowStore, MonthIndex) or the payload keys change.
+FORMAT_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    spreadsheet_id TEXT NOT NULL,
+    sheet_title TEXT NOT NULL,
+    format INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    saved_at REAL NOT NULL,
+    payload BLOB NOT NULL,
+    PRIMARY KEY (spreadsheet_id, sheet_title)
+);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+# On-disk copy of the parsed tabs, shared by every server process on the host. Each tab's
+# row holds the snapshot, its incremental-sync check rows, its sheet properties and its
+# event colors, stamped with the payload format and a version that every save advances.
+# A process adopts a tab's row when it has no fresh snapshot and the row's version is newer
+# than the last one it saw, so a restarted or newly started worker renders from disk and
+# revalidates in the background, and workers reuse each other's reads. The file is a
+# local, trusted cache (payloads are pickled); deleting it only costs a full read.
+class SnapshotStore:
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._versions = {}  # (spreadsheet_id, sheet_title) -> version adopted or saved last
+        self._saved = {}  # (spreadsheet_id, sheet_title) -> snapshot saved or adopted last
+        self._saving = set()
+        self._lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._ready = False
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot-store")
+
+    # Function to create the table on first use
+    def _ensure_schema(self, conn):
+        with self._schema_lock:
+            if not self._ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                self._ready = True
+
+    # Function to open a short-lived connection in a transaction
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            self._ensure_schema(conn)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # Function to load the saved tabs that this process has no fresh snapshot of into the
+    # caches. Returns the titles that were restored; they should be revalidated.
+    def restore(self, spreadsheet_id, sheet_titles):
+        titles = [title for title in sheet_titles if snapshot_cache.get(spreadsheet_id, title) is None]
+        if not titles:
+            return []
+        try:
+            with self._connect() as conn:
+                records = conn.execute(
+                    f"SELECT sheet_title, version, saved_at, payload FROM snapshots WHERE spreadsheet_id = ? AND format = ? "
+                    f"AND sheet_title IN ({', '.join('?' * len(titles))})",
+                    (spreadsheet_id, FORMAT_VERSION, *titles)
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Could not read the snapshot store: %s", e)
+            return []
+
+        restored = []
+        for title, version, saved_at, payload in records:
+            key = (spreadsheet_id, title)
+            age = max(0.0, time.time() - saved_at)
+            with self._lock:
+                if version <= self._versions.get(key, 0) or age > MAX_RESTORE_AGE:
+                    continue
+            generation = snapshot_cache.generation(spreadsheet_id, title)
+            try:
+                saved = pickle.loads(payload)
+            except Exception as e:  # Written by an incompatible version: the tab is read again
+                logger.warning("Could not restore %s: %s", title, e)
+                continue
+            if not snapshot_cache.put(spreadsheet_id, title, saved['snapshot'], generation=generation):
+                continue  # A write or refresh got there first
+            if saved['sync'] is not None:
+                incremental_sync.restore(spreadsheet_id, title, saved['sync'], age=age)
+            if saved['properties'] is not None:
+                sheet_registry.restore(spreadsheet_id, title, saved['properties'])
+            if saved['colors'] is not None:
+                event_color_registry.restore(spreadsheet_id, title, saved['colors'])
+            with self._lock:
+                self._versions[key] = version
+                self._saved[key] = saved['snapshot']
+            restored.append(title)
+        return restored
+
+    # Function to save the cached snapshots of the given tabs that changed since they were
+    # saved or restored
+    def save(self, spreadsheet_id, sheet_titles):
+        for title in sheet_titles:
+            key = (spreadsheet_id, title)
+            snapshot = snapshot_cache.get_stale(spreadsheet_id, title)
+            with self._lock:
+                if snapshot is None or self._saved.get(key) is snapshot:
+                    continue
+            payload = pickle.dumps({
+                'snapshot': snapshot,
+                'sync': incremental_sync.export(spreadsheet_id, title),
+                'properties': sheet_registry.export(spreadsheet_id, title),
+                'colors': event_color_registry.export(spreadsheet_id, title)
+            }, protocol=pickle.HIGHEST_PROTOCOL)
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO snapshots (spreadsheet_id, sheet_title, format, version, saved_at, payload) VALUES (?, ?, ?, 1, ?, ?) "
+                    "ON CONFLICT (spreadsheet_id, sheet_title) DO UPDATE SET format = excluded.format, "
+                    "version = snapshots.version + 1, saved_at = excluded.saved_at, payload = excluded.payload",
+                    (spreadsheet_id, title, FORMAT_VERSION, time.time(), payload)
+                )
+                (version,) = conn.execute(
+                    "SELECT version FROM snapshots WHERE spreadsheet_id = ? AND sheet_title = ?", (spreadsheet_id, title)
+                ).fetchone()
+            with self._lock:
+                self._versions[key] = version
+                self._saved[key] = snapshot
+
+    # Function to save changed tabs on the store's thread, off the rerun
+    def _save_in_background(self, spreadsheet_id, sheet_titles):
+        try:
+            self.save(spreadsheet_id, sheet_titles)
+        except Exception as e:  # Best effort: the next rerun saves again
+            logger.warning("Could not save snapshots of %s: %s", ", ".join(sheet_titles), e)
+        finally:
+            with self._lock:
+                self._saving.discard(spreadsheet_id)
+
+    # Function to schedule a background save unless one is already running for the spreadsheet
+    def save_async(self, spreadsheet_id, sheet_titles):
+        with self._lock:
+            if spreadsheet_id in self._saving:
+                return
+            self._saving.add(spreadsheet_id)
+        self._pool.submit(self._save_in_background, spreadsheet_id, list(sheet_titles))
+
+
+# Process-wide store shared by every Streamlit session
+snapshot_store = SnapshotStore()
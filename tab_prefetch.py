@@ -0,0 +1,126 @@
+# tab_prefetch.py
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from googleapiclient.errors import HttpError
+
+from snapshot_cache import snapshot_cache, DEFAULT_TTL
+from incremental_sync import incremental_sync
+from utils import fetch_tabs_values
+
+# Snapshots older than this (seconds) are refreshed in the background before the cache TTL expires
+REFRESH_AFTER = float(os.environ.get("SHEET_REFRESH_AFTER", DEFAULT_TTL / 2))
+PARSE_WORKERS = 2
+
+logger = logging.getLogger(__name__)
+
+
+# Loads every configured tab of a spreadsheet with one values().batchGet, parses the tabs
+# on a thread pool and keeps the parsed snapshots warm in the snapshot cache, so switching
+# tabs in the sidebar renders from memory. `loaders` maps each tab title to its
+# (parse, extend) pair: the function turning the tab's raw values into a snapshot
+# (e.g. parse_theater_values) and the one merging new bottom rows into a snapshot.
+class TabPrefetcher:
+    def __init__(self, cache=snapshot_cache, parse_workers=PARSE_WORKERS):
+        self._cache = cache
+        self._parse_pool = ThreadPoolExecutor(max_workers=parse_workers, thread_name_prefix="sheets-parse")
+        self._refresh_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheets-refresh")
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    # Function to parse one tab and store the snapshot unless a write invalidated the tab meanwhile
+    def _parse(self, spreadsheet_id, sheet_title, parse, values, generation):
+        try:
+            snapshot = parse(values)
+        except ValueError as e:
+            # Not cached: the display function reads the tab again and shows the error
+            logger.warning("Could not parse %s: %s", sheet_title, e)
+            return None
+        incremental_sync.remember(spreadsheet_id, sheet_title, values, len(snapshot[0]))
+        self._cache.put(spreadsheet_id, sheet_title, snapshot, generation=generation)
+        return snapshot
+
+    # Function to read the given tabs in one batchGet and parse them in parallel.
+    # Returns {title: future of the snapshot}.
+    def _load(self, service, spreadsheet_id, loaders, background=False):
+        titles = list(loaders)
+        generations = {title: self._cache.generation(spreadsheet_id, title) for title in titles}
+        values_by_title = fetch_tabs_values(service, spreadsheet_id, titles, background=background)
+        return {
+            title: self._parse_pool.submit(self._parse, spreadsheet_id, title, loaders[title][0], values, generations[title])
+            for title, values in values_by_title.items()
+        }
+
+    # Function to bring the given tabs up to date: stale snapshots are first refreshed with
+    # their new bottom rows only (one batchGet for all tabs), then the tabs without a usable
+    # snapshot are read in full (a second batchGet) and parsed on the pool.
+    # Returns {title: future} for the tabs still being parsed.
+    def _sync(self, service, spreadsheet_id, loaders, background=False):
+        generations = {title: self._cache.generation(spreadsheet_id, title) for title in loaders}
+        stale = {}
+        for title, (_, extend) in loaders.items():
+            snapshot = self._cache.get_stale(spreadsheet_id, title)
+            if snapshot is not None:
+                stale[title] = (snapshot, extend)
+        refreshed = incremental_sync.refresh(service, spreadsheet_id, stale, background=background) if stale else {}
+        for title, snapshot in refreshed.items():
+            if snapshot is not None:
+                self._cache.put(spreadsheet_id, title, snapshot, generation=generations[title])
+
+        full = {title: loader for title, loader in loaders.items() if refreshed.get(title) is None}
+        return self._load(service, spreadsheet_id, full, background=background) if full else {}
+
+    # Function to load every tab that is not cached yet, waiting only for the tab about to be
+    # rendered. Returns {title: future} for the tabs still being parsed.
+    def load(self, service, spreadsheet_id, loaders, wait_for=None):
+        missing = {title: loader for title, loader in loaders.items() if self._cache.get(spreadsheet_id, title) is None}
+        if not missing:
+            return {}
+        try:
+            futures = self._sync(service, spreadsheet_id, missing)
+        except HttpError as e:
+            # The display function retries the selected tab and reports the error
+            logger.warning("Prefetching %s failed: %s", ", ".join(missing), e)
+            return {}
+        if wait_for in futures:
+            futures[wait_for].result()
+        return futures
+
+    # Function to refresh stale tabs with a pooled transport of its own
+    def _refresh(self, manager, spreadsheet_id, loaders):
+        try:
+            with manager.lease() as service:
+                futures = self._sync(service, spreadsheet_id, loaders, background=True)
+            for future in futures.values():
+                future.result()
+        except Exception as e:  # Best effort: the tabs are read again when their snapshots expire
+            logger.warning("Background refresh of %s failed: %s", ", ".join(loaders), e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(spreadsheet_id)
+
+    # Function to refresh the given tabs in the background (e.g. after they were restored
+    # from the snapshot store), unless a refresh of the spreadsheet is already running
+    def revalidate(self, manager, spreadsheet_id, loaders):
+        if not loaders:
+            return
+        with self._lock:
+            if spreadsheet_id in self._refreshing:
+                return
+            self._refreshing.add(spreadsheet_id)
+        self._refresh_pool.submit(self._refresh, manager, spreadsheet_id, loaders)
+
+    # Function to refresh, in the background, the tabs whose snapshots are about to expire
+    def keep_warm(self, manager, spreadsheet_id, loaders):
+        stale = {}
+        for title, loader in loaders.items():
+            age = self._cache.age(spreadsheet_id, title)
+            if age is not None and age > REFRESH_AFTER:
+                stale[title] = loader
+        self.revalidate(manager, spreadsheet_id, stale)
+
+
+# Process-wide prefetcher shared by every Streamlit session
+tab_prefetcher = TabPrefetcher()
@@ -0,0 +1,124 @@
+# theater_rows.py
+# Parsing and append planning for the theater sheet, shared by the Streamlit page
+# (theater_show.py), the write queue and the command line (cli.py). Nothing here uses streamlit.
+from utils import pad_row, insert_rows_request, update_cells_request, row_format_request
+from month_index import MonthIndex
+from row_store import RowStore
+from tracing import traced
+
+# Dictionary for month names in Bahasa Indonesia
+MONTH_NAMES_ID = {
+    1: "Januari",
+    2: "Februari",
+    3: "Maret",
+    4: "April",
+    5: "Mei",
+    6: "Juni",
+    7: "Juli",
+    8: "Agustus",
+    9: "September",
+    10: "Oktober",
+    11: "November",
+    12: "Desember"
+}
+
+# Reverse lookup used to order month sections
+MONTH_NUMBERS_ID = {name: number for number, name in MONTH_NAMES_ID.items()}
+
+# Function to extract month name and year from date string in Bahasa Indonesia
+def get_month_year(tanggal):
+    try:
+        _, month, year = map(int, tanggal.split('/'))
+        month_name = MONTH_NAMES_ID[month]
+        return f"{month_name} {year}"
+    except:
+        return None
+
+# Function to get the (year, month) sort key of a month title like "Januari 2025"
+def month_key(month_year):
+    try:
+        month_name, year = month_year.rsplit(' ', 1)
+        return int(year), MONTH_NUMBERS_ID[month_name]
+    except (KeyError, ValueError):
+        return None
+
+EXPECTED_HEADERS = ['NO', 'Tanggal', 'Show', 'Setlist', 'Unit Song']
+# Columns whose values repeat across rows (Tanggal, Show, Setlist) and share one string in the row store
+SHARED_COLUMNS = (1, 2, 3)
+
+# Function to parse the raw values of the theater sheet into headers, rows and month sections
+@traced("parse_theater_values")
+def parse_theater_values(values):
+    headers = [str(v) for v in values[2]] if len(values) > 2 else []
+    if not headers:
+        raise ValueError("No headers found in the sheet (Row 2).")
+    if headers != EXPECTED_HEADERS:
+        raise ValueError(f"Header mismatch. Found: {headers}, Expected: {EXPECTED_HEADERS}")
+
+    # Parse data and group by month sections
+    month_sections = MonthIndex()
+    data_rows, _ = collect_theater_rows(values[2:], 2, headers, month_sections, None)
+    data = RowStore(headers, key_column=0, shared_columns=SHARED_COLUMNS)
+    data.extend(data_rows)
+    return headers, data, month_sections, len(values)
+
+# Function to sort sheet rows into month sections. rows start at the 0-based sheet index
+# first_index and continue the section current_month. Returns the data rows and the month
+# section the last row belongs to.
+def collect_theater_rows(rows, first_index, headers, month_sections, current_month):
+    data_rows = []
+    width = len(headers)
+    for i, row in enumerate(rows, start=first_index):
+        row_values = pad_row(row, width)
+
+        # Check if this row is a month title (only first column has a value)
+        if row_values[0] and all(val == '' for val in row_values[1:]):
+            current_month = row_values[0]
+            month_sections.add_section(current_month, i + 1, month_key(current_month))
+        elif row_values[0] in headers:  # Skip header rows
+            continue
+        elif any(val for val in row_values) and current_month:  # Data row under a month
+            month_sections[current_month]['row_count'] += 1
+            data_rows.append(row_values)
+    return data_rows, current_month
+
+# Function to add rows appended below a snapshot. The cached snapshot is shared, so the
+# month index and the row store are copied before the rows are merged in.
+@traced("extend_theater_snapshot")
+def extend_theater_snapshot(snapshot, rows):
+    headers, data, month_sections, total_rows = snapshot
+    month_sections = month_sections.copy()
+    data_rows, _ = collect_theater_rows(rows, total_rows, headers, month_sections, month_sections.last_title())
+    data = data.copy()
+    data.extend(data_rows)
+    return headers, data, month_sections, total_rows + len(rows)
+
+# Function to build the snapshot after data rows were written, given the month index
+# planned for the write and the number of sheet rows inserted (the snapshot is not changed)
+def theater_snapshot_after(snapshot, month_sections, rows, inserted_rows):
+    headers, data, _, total_rows = snapshot
+    data = data.copy()
+    data.extend(rows)
+    return headers, data, month_sections, total_rows + inserted_rows
+
+# Function to build the batchUpdate requests that insert a data row under its month section.
+# Returns the requests, the 0-based insert index, the number of inserted rows and whether
+# a new month section was opened.
+def build_theater_append_requests(sheet_id, headers, month_sections, total_rows, month_year, new_row):
+    width = len(headers)
+    insert_index, new_section = month_sections.insertion_point(month_year, month_key(month_year), total_rows)
+    if not new_section:
+        # Insert right after the last data row of the section
+        return [
+            insert_rows_request(sheet_id, insert_index, 1),
+            update_cells_request(sheet_id, insert_index, [new_row])
+        ], insert_index, 1, False
+
+    # New month: title row, header row and the data row, placed in chronological order
+    month_row = pad_row([month_year], width)
+    return [
+        insert_rows_request(sheet_id, insert_index, 3),
+        update_cells_request(sheet_id, insert_index, [month_row, headers, new_row]),
+        row_format_request(sheet_id, insert_index + 1, width, is_header=False),
+        row_format_request(sheet_id, insert_index + 2, width, is_header=True)
+    ], insert_index, 3, True
@@ -0,0 +1,120 @@
+# tracing.py
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Trace records kept for the JSON lines export
+HISTORY_SIZE = 5000
+
+
+# Lightweight instrumentation for Sheets calls and parse steps. When disabled a span costs
+# one attribute check; when enabled each span records operation, latency, nesting depth
+# and any fields the caller fills in (payload bytes, retries, ...). Records go to the
+# current rerun's list (per thread) and to a bounded process-wide history. Tracing is on
+# or off per thread: a rerun sets it for its own thread, and every other thread (write
+# queue, prefetch, refresh) follows the process default (SHEETS_TRACE).
+class Tracer:
+    def __init__(self, enabled=False, history_size=HISTORY_SIZE):
+        self.default_enabled = enabled
+        self._history = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.startup = None  # Import and first render time of the process, see record_startup()
+
+    # Whether spans are recorded on the calling thread
+    @property
+    def enabled(self):
+        return getattr(self._local, 'enabled', self.default_enabled)
+
+    # Function to start collecting the records of a new Streamlit rerun on this thread;
+    # `enabled` switches tracing for this thread only (None keeps the process default)
+    def begin_rerun(self, enabled=None):
+        self._local.records = []
+        self._local.depth = 0
+        self._local.enabled = self.default_enabled if enabled is None else enabled
+
+    # Function to get the records of the current rerun
+    def rerun_records(self):
+        return list(getattr(self._local, 'records', []))
+
+    # Function to store one record
+    def record(self, operation, seconds, **fields):
+        entry = {
+            'ts': round(time.time(), 3),
+            'operation': operation,
+            'ms': round(seconds * 1000, 3),
+            'depth': getattr(self._local, 'depth', 0),
+            'thread': threading.current_thread().name,
+            **fields
+        }
+        records = getattr(self._local, 'records', None)
+        if records is not None:
+            records.append(entry)
+        with self._lock:
+            self._history.append(entry)
+
+    # Function to time a block; the yielded dict can be filled with extra fields
+    @contextmanager
+    def span(self, operation, **fields):
+        if not self.enabled:
+            yield fields
+            return
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        started = time.perf_counter()
+        try:
+            yield fields
+        except Exception as e:
+            fields['error'] = type(e).__name__
+            raise
+        finally:
+            self._local.depth = depth
+            self.record(operation, time.perf_counter() - started, **fields)
+
+    # Function to record how long the app's imports and its first render took. Only the
+    # first call of the process is kept (later reruns find the modules imported); returns
+    # whether this call was the first.
+    def record_startup(self, import_seconds, render_seconds):
+        with self._lock:
+            if self.startup is not None:
+                return False
+            self.startup = {'import_ms': round(import_seconds * 1000, 3), 'first_render_ms': round(render_seconds * 1000, 3)}
+            return True
+
+    # Function to export the recorded history as JSON lines
+    def export_jsonl(self):
+        with self._lock:
+            return "\n".join(json.dumps(entry, default=str) for entry in self._history) + "\n"
+
+
+# Function to summarise rerun records: the wall time of top-level spans and the API totals
+def summarize(records):
+    api_records = [entry for entry in records if entry['operation'].startswith('api ')]
+    return {
+        'total_ms': round(sum(entry['ms'] for entry in records if entry['depth'] == 0), 3),
+        'api_calls': len([entry for entry in api_records if not entry.get('coalesced')]),
+        'api_ms': round(sum(entry['ms'] for entry in api_records), 3),
+        'api_bytes': sum(entry.get('bytes', 0) for entry in api_records),
+        'retries': sum(entry.get('retries', 0) for entry in api_records)
+    }
+
+
+# Process-wide tracer; SHEETS_TRACE=1 switches it on at startup
+tracer = Tracer(enabled=os.environ.get("SHEETS_TRACE", "") == "1")
+
+
+# Decorator tracing every call of a function under the given operation name
+def traced(operation):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(operation):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
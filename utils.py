@@ -1,6 +1,10 @@
 # utils.py
 import re
 from googleapiclient.errors import HttpError
+from api_scheduler import api_scheduler, READ, WRITE
+from sheet_metadata import sheet_registry
+from snapshot_cache import snapshot_cache
+from tracing import traced
 
 # Function to convert column index to letter (e.g., 0 -> A, 1 -> B)
 def col_index_to_letter(index):
@@ -10,6 +14,38 @@ def col_index_to_letter(index):
         index = (index // 26) - 1
     return letter
 
+# Function to build an A1 range with the sheet title quoted (titles may contain spaces)
+def a1_range(sheet_title, cell_range=None):
+    quoted = "'" + sheet_title.replace("'", "''") + "'"
+    return f"{quoted}!{cell_range}" if cell_range else quoted
+
+# Function to read only the formatted cell values of a sheet (no formats or metadata)
+@traced("fetch_sheet_values")
+def fetch_sheet_values(service, spreadsheet_id, sheet_title, coalesce=True):
+    result = api_scheduler.execute(service.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id,
+        range=a1_range(sheet_title),
+        valueRenderOption="FORMATTED_VALUE",
+        fields="values"
+    ), READ, coalesce=coalesce)
+    return result.get('values', [])
+
+# Function to read the values of several tabs with one batchGet; returns {title: values}
+@traced("fetch_tabs_values")
+def fetch_tabs_values(service, spreadsheet_id, sheet_titles, background=False):
+    result = api_scheduler.execute(service.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id,
+        ranges=[a1_range(title) for title in sheet_titles],
+        valueRenderOption="FORMATTED_VALUE",
+        fields="valueRanges(values)"
+    ), READ, background=background)
+    value_ranges = result.get('valueRanges', [])
+    return {title: value_range.get('values', []) for title, value_range in zip(sheet_titles, value_ranges)}
+
+# Function to pad a row of values to the given width
+def pad_row(row, width):
+    return list(row) + [''] * (width - len(row))
+
 # Function to validate date format (DD/MM/YYYY)
 def validate_date(tanggal):
     pattern = r"^\d{2}/\d{2}/\d{4}$"
@@ -23,71 +59,111 @@ def validate_date(tanggal):
     except ValueError:
         return False
 
-# Function to apply formatting to a row
-def apply_row_formatting(service, spreadsheet_id, sheet_id, row_index, is_header=False, is_title=False, sheet_name="Theater1"):
-    try:
-        # Determine the background color based on the row type
-        if is_title:
-            background_color = {
-                "red": 1.0,
-                "green": 0.4,
-                "blue": 0.8
-            }  # Pink for title row in "Video Call"
-        elif is_header:
-            background_color = {
-                "red": 0.8,
-                "green": 0.0,
-                "blue": 0.8
-            }  # Purple for headers
-        else:
-            background_color = {
-                "red": 0.0,
-                "green": 1.0,
-                "blue": 1.0
-            }  # Cyan for month rows in "Theater1"
-
-        end_column = 5 if sheet_name == "theater_test" else 4  # 5 columns for Theater1, 4 for Video Call
+# Function to build the repeatCell request that formats a title, header or month row
+def row_format_request(sheet_id, row_index, end_column, is_header=False, is_title=False):
+    # Determine the background color based on the row type
+    if is_title:
+        background_color = {
+            "red": 1.0,
+            "green": 0.4,
+            "blue": 0.8
+        }  # Pink for title row in "Video Call"
+    elif is_header:
+        background_color = {
+            "red": 0.8,
+            "green": 0.0,
+            "blue": 0.8
+        }  # Purple for headers
+    else:
+        background_color = {
+            "red": 0.0,
+            "green": 1.0,
+            "blue": 1.0
+        }  # Cyan for month rows in "Theater1"
 
-        requests = [
-            {
-                "repeatCell": {
-                    "range": {
-                        "sheetId": sheet_id,
-                        "startRowIndex": row_index - 1,  # 0-based index
-                        "endRowIndex": row_index,
-                        "startColumnIndex": 0,
-                        "endColumnIndex": end_column
-                    },
-                    "cell": {
-                        "userEnteredFormat": {
-                            "backgroundColor": background_color,
-                            "horizontalAlignment": "CENTER",
-                            "textFormat": {
-                                "bold": True
-                            }
-                        }
-                    },
-                    "fields": "userEnteredFormat(backgroundColor,horizontalAlignment,textFormat.bold)"
+    return {
+        "repeatCell": {
+            "range": {
+                "sheetId": sheet_id,
+                "startRowIndex": row_index - 1,  # 0-based index
+                "endRowIndex": row_index,
+                "startColumnIndex": 0,
+                "endColumnIndex": end_column
+            },
+            "cell": {
+                "userEnteredFormat": {
+                    "backgroundColor": background_color,
+                    "horizontalAlignment": "CENTER",
+                    "textFormat": {
+                        "bold": True
+                    }
                 }
-            }
-        ]
+            },
+            "fields": "userEnteredFormat(backgroundColor,horizontalAlignment,textFormat.bold)"
+        }
+    }
 
-        body = {"requests": requests}
-        service.spreadsheets().batchUpdate(
+# Function to build the insertDimension request that opens empty rows at a 0-based index
+def insert_rows_request(sheet_id, start_index, count):
+    return {
+        "insertDimension": {
+            "range": {
+                "sheetId": sheet_id,
+                "dimension": "ROWS",
+                "startIndex": start_index,
+                "endIndex": start_index + count
+            },
+            "inheritFromBefore": start_index > 0
+        }
+    }
+
+# Function to build the updateCells request that writes rows of raw strings from a 0-based index
+def update_cells_request(sheet_id, start_index, rows):
+    return {
+        "updateCells": {
+            "start": {
+                "sheetId": sheet_id,
+                "rowIndex": start_index,
+                "columnIndex": 0
+            },
+            "rows": [
+                {"values": [{"userEnteredValue": {"stringValue": str(value)}} for value in row]}
+                for row in rows
+            ],
+            "fields": "userEnteredValue"
+        }
+    }
+
+# Function to get the width of a tab's header row from its cached snapshot, falling back
+# to the widths of the two known layouts (5 columns for theater tabs, 4 for Video Call)
+def header_width(spreadsheet_id, sheet_id, sheet_name):
+    sheet_name = sheet_registry.find_title_by_id(spreadsheet_id, sheet_id) or sheet_name
+    snapshot = snapshot_cache.get_stale(spreadsheet_id, sheet_name)
+    if snapshot is not None and snapshot[0]:
+        return len(snapshot[0])
+    return 5 if "theater" in sheet_name.lower() else 4
+
+# Function to apply formatting to a row
+def apply_row_formatting(service, spreadsheet_id, sheet_id, row_index, is_header=False, is_title=False, sheet_name="Theater1", end_column=None):
+    try:
+        # Format the table's width (its header row) unless the caller passes it; the grid's
+        # column count would also color the empty columns past the table
+        if end_column is None:
+            end_column = header_width(spreadsheet_id, sheet_id, sheet_name)
+        body = {"requests": [row_format_request(sheet_id, row_index, end_column, is_header=is_header, is_title=is_title)]}
+        api_scheduler.execute(service.spreadsheets().batchUpdate(
             spreadsheetId=spreadsheet_id,
             body=body
-        ).execute()
+        ), WRITE)
     except HttpError as e:
         print(f"Error applying formatting: {e}")
 
-# Function to get the sheet ID (required for formatting)
+# Function to get the sheet ID (required for formatting) from the cached metadata registry
+@traced("get_sheet_id")
 def get_sheet_id(service, spreadsheet_id, sheet_title):
     try:
-        spreadsheet = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        for sheet in spreadsheet['sheets']:
-            if sheet['properties']['title'] == sheet_title:
-                return sheet['properties']['sheetId']
-        return None
+        properties = sheet_registry.get(service, spreadsheet_id, sheet_title)
+        return properties['sheet_id'] if properties else None
     except HttpError as e:
         print(f"Error fetching sheet ID: {e}")
-        return None
\ No newline at end of file
+        return None
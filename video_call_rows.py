@@ -0,0 +1,63 @@
+# video_call_rows.py
+# Parsing of the Video Call sheet, shared by the Streamlit page (video_call.py), the write
+# queue and the command line (cli.py). Nothing here uses streamlit.
+from utils import pad_row
+from row_store import RowStore
+from tracing import traced
+# Dictionary for month names in Bahasa Indonesia
+MONTH_NAMES_ID = {
+    1: "Januari",
+    2: "Februari",
+    3: "Maret",
+    4: "April",
+    5: "Mei",
+    6: "Juni",
+    7: "Juli",
+    8: "Agustus",
+    9: "September",
+    10: "Oktober",
+    11: "November",
+    12: "Desember"
+}
+
+# Function to format date as "date, month year" with month in Bahasa Indonesia
+def format_date_indonesian(tanggal):
+    try:
+        day, month, year = map(int, tanggal.split('/'))
+        month_name = MONTH_NAMES_ID[month]
+        return f"{day}, {month_name} {year}"
+    except:
+        return tanggal  # Fallback to original format if parsing fails
+
+EXPECTED_HEADERS = ['Sesi', 'Waktu', 'Tanggal', 'Nama Event']
+# Every Video Call column repeats across rows, so all of them share strings in the row store
+SHARED_COLUMNS = (0, 1, 2, 3)
+
+# Function to parse the raw values of the Video Call sheet into headers and rows
+@traced("parse_video_call_values")
+def parse_video_call_values(values):
+    headers = [str(v) for v in values[2]] if len(values) > 2 else []
+    if not headers:
+        raise ValueError("No headers found in the sheet (Row 2).")
+    if headers != EXPECTED_HEADERS:
+        raise ValueError(f"Header mismatch. Found: {headers}, Expected: {EXPECTED_HEADERS}")
+
+    # Parse data
+    data_rows = []
+    width = len(headers)
+    for row in values[2:]:
+        row_values = pad_row(row, width)
+        if any(val for val in row_values):  # Exclude empty rows
+            data_rows.append(row_values)
+
+    data = RowStore(headers, shared_columns=SHARED_COLUMNS)
+    data.extend(data_rows)
+    return headers, data, None, len(values)
+
+# Function to add rows appended below a snapshot (on a copy: the cached snapshot is shared)
+@traced("extend_video_call_snapshot")
+def extend_video_call_snapshot(snapshot, rows):
+    headers, data, month_sections, total_rows = snapshot
+    data = data.copy()
+    data.extend([row for row in rows if any(val for val in row)])
+    return headers, data, month_sections, total_rows + len(rows)
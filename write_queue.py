@@ -0,0 +1,340 @@
+# write_queue.py
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from googleapiclient.errors import HttpError
+
+from utils import get_sheet_id
+from sheet_writer import sheet_writer
+from row_import import build_theater_import_blocks, build_video_call_import_blocks
+from theater_rows import parse_theater_values, extend_theater_snapshot, theater_snapshot_after
+from video_call_rows import parse_video_call_values, extend_video_call_snapshot
+from event_colors import event_color_registry
+from tracing import traced
+
+# Journal location, how many entries one flush writes at most, and the retry backoff (seconds)
+DEFAULT_JOURNAL_PATH = os.environ.get("WRITE_QUEUE_PATH", "write_queue.db")
+MAX_BATCH_SIZE = 200
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+# HTTP statuses worth retrying; anything else is reported as failed
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Synced entries are kept this long (seconds) so the sidebar can show them
+SYNCED_RETENTION = 7 * 24 * 3600
+# Entries claimed by a worker longer ago than this (seconds) are taken to belong to a worker
+# that died mid-flush, and are queued again
+CLAIM_TIMEOUT = float(os.environ.get("WRITE_QUEUE_CLAIM_TIMEOUT", 300))
+
+KIND_THEATER = "theater"
+KIND_VIDEO_CALL = "video_call"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_writes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    spreadsheet_id TEXT NOT NULL,
+    sheet_title TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    synced_at REAL,
+    claimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS pending_writes_status ON pending_writes (status, next_attempt_at);
+"""
+
+
+# Error raised by a flush that should not be retried (bad headers, duplicate NO, ...)
+class PermanentWriteError(Exception):
+    pass
+
+
+# Durable write-ahead queue: submissions are committed to a local SQLite journal first and
+# a background worker drains them to the Sheets API in batches, retrying with exponential
+# backoff while the API is slow or out of quota.
+class WriteQueue:
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self._manager = None
+        self._worker = None
+        self._wake = threading.Event()
+        self._start_lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._ready = False
+
+    # Function to create the journal on first use, so importing this module (e.g. from the
+    # command line, which writes directly) touches no file
+    def _ensure_schema(self, conn):
+        with self._schema_lock:
+            if not self._ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                # Journals created before entries were claimed lack the column
+                columns = {name for _, name, *_ in conn.execute("PRAGMA table_info(pending_writes)")}
+                if "claimed_at" not in columns:
+                    conn.execute("ALTER TABLE pending_writes ADD COLUMN claimed_at REAL")
+                self._ready = True
+
+    # Function to open a short-lived connection in a transaction; each call gets its own,
+    # so any thread can use the queue
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            self._ensure_schema(conn)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # Function to start the background worker once per process
+    def start(self, manager):
+        with self._start_lock:
+            self._manager = manager
+            if self._worker is None or not self._worker.is_alive():
+                self._prune()
+                self._worker = threading.Thread(target=self._run, name="sheets-write-queue", daemon=True)
+                self._worker.start()
+
+    # Function to journal a row; it is durable once this returns
+    def enqueue(self, spreadsheet_id, sheet_title, kind, row, event_color=None):
+        payload = json.dumps({"row": row, "event_color": event_color})
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO pending_writes (spreadsheet_id, sheet_title, kind, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (spreadsheet_id, sheet_title, kind, payload, time.time())
+            )
+        self._wake.set()
+        return cursor.lastrowid
+
+    # Function to journal several rows in one transaction, so the worker takes them as one
+    # batch and writes them with a single batchUpdate. event_colors maps an event name to
+    # its color (Video Call rows).
+    def enqueue_many(self, spreadsheet_id, sheet_title, kind, rows, event_colors=None):
+        event_colors = event_colors or {}
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO pending_writes (spreadsheet_id, sheet_title, kind, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(spreadsheet_id, sheet_title, kind,
+                  json.dumps({"row": row, "event_color": event_colors.get(row[3]) if kind == KIND_VIDEO_CALL else None}), now)
+                 for row in rows]
+            )
+        self._wake.set()
+
+    # Function to get the rows still waiting to be written to a sheet (queued or being written)
+    def pending_rows(self, spreadsheet_id, sheet_title):
+        with self._connect() as conn:
+            records = conn.execute(
+                "SELECT payload FROM pending_writes WHERE spreadsheet_id = ? AND sheet_title = ? "
+                "AND status IN ('pending', 'in_flight') ORDER BY id",
+                (spreadsheet_id, sheet_title)
+            ).fetchall()
+        return [json.loads(payload)["row"] for payload, in records]
+
+    # Function to count entries per status for a sheet
+    def counts(self, spreadsheet_id, sheet_title):
+        with self._connect() as conn:
+            records = conn.execute(
+                "SELECT status, COUNT(*) FROM pending_writes WHERE spreadsheet_id = ? AND sheet_title = ? GROUP BY status",
+                (spreadsheet_id, sheet_title)
+            ).fetchall()
+        counts = {"pending": 0, "synced": 0, "failed": 0}
+        counts.update(dict(records))
+        counts["pending"] += counts.pop("in_flight", 0)
+        return counts
+
+    # Function to list the latest entries of a sheet as dicts, newest first
+    def recent(self, spreadsheet_id, sheet_title, limit=10):
+        with self._connect() as conn:
+            records = conn.execute(
+                "SELECT id, payload, status, attempts, last_error, created_at, synced_at FROM pending_writes "
+                "WHERE spreadsheet_id = ? AND sheet_title = ? ORDER BY id DESC LIMIT ?",
+                (spreadsheet_id, sheet_title, limit)
+            ).fetchall()
+        return [
+            {"id": entry_id, "row": json.loads(payload)["row"], "status": status, "attempts": attempts,
+             "last_error": last_error, "created_at": created_at, "synced_at": synced_at}
+            for entry_id, payload, status, attempts, last_error, created_at, synced_at in records
+        ]
+
+    # Function to put failed entries of a sheet back in the queue
+    def retry_failed(self, spreadsheet_id, sheet_title):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE pending_writes SET status = 'pending', next_attempt_at = 0, attempts = 0 "
+                "WHERE spreadsheet_id = ? AND sheet_title = ? AND status = 'failed'",
+                (spreadsheet_id, sheet_title)
+            )
+        self._wake.set()
+
+    # Function to delete synced entries older than the retention window
+    def _prune(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pending_writes WHERE status = 'synced' AND synced_at < ?", (time.time() - SYNCED_RETENTION,))
+
+    # Function to claim the next due batch: the oldest due entry and the due entries queued
+    # after it for the same sheet, in submission order. Every server process on the host runs
+    # a worker on the same journal, so the batch is marked in flight in the transaction that
+    # selects it (BEGIN IMMEDIATE holds the write lock throughout); other workers skip it.
+    def _next_batch(self):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE pending_writes SET status = 'pending', claimed_at = NULL WHERE status = 'in_flight' AND claimed_at < ?",
+                (now - CLAIM_TIMEOUT,)
+            )
+            first = conn.execute(
+                "SELECT spreadsheet_id, sheet_title, kind FROM pending_writes "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if first is None:
+                return None, []
+            records = conn.execute(
+                "SELECT id, payload, attempts FROM pending_writes WHERE status = 'pending' AND next_attempt_at <= ? "
+                "AND spreadsheet_id = ? AND sheet_title = ? AND kind = ? ORDER BY id LIMIT ?",
+                (now, *first, MAX_BATCH_SIZE)
+            ).fetchall()
+            claimed = {entry_id for entry_id, in conn.execute(
+                f"UPDATE pending_writes SET status = 'in_flight', claimed_at = ? "
+                f"WHERE status = 'pending' AND id IN ({', '.join('?' * len(records))}) RETURNING id",
+                (now, *(entry_id for entry_id, _, _ in records))
+            ).fetchall()}
+        entries = [{"id": entry_id, "attempts": attempts, **json.loads(payload)}
+                   for entry_id, payload, attempts in records if entry_id in claimed]
+        return first, entries
+
+    # Function to get how long the worker may sleep before an entry becomes due
+    def _seconds_until_due(self):
+        with self._connect() as conn:
+            (next_at,) = conn.execute("SELECT MIN(next_attempt_at) FROM pending_writes WHERE status = 'pending'").fetchone()
+        if next_at is None:
+            return None
+        return max(0.0, next_at - time.time())
+
+    # Function to mark entries as written
+    def _mark_synced(self, entry_ids):
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE pending_writes SET status = 'synced', synced_at = ?, last_error = NULL, claimed_at = NULL WHERE id = ?",
+                [(time.time(), entry_id) for entry_id in entry_ids]
+            )
+
+    # Function to mark entries as failed for good
+    def _mark_failed(self, entry_ids, error):
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE pending_writes SET status = 'failed', last_error = ?, claimed_at = NULL WHERE id = ?",
+                [(str(error), entry_id) for entry_id in entry_ids]
+            )
+
+    # Function to put entries back in the queue for another attempt with jittered exponential backoff
+    def _mark_retry(self, entries, error):
+        with self._connect() as conn:
+            for entry in entries:
+                attempts = entry["attempts"] + 1
+                delay = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+                conn.execute(
+                    "UPDATE pending_writes SET status = 'pending', claimed_at = NULL, attempts = ?, next_attempt_at = ?, "
+                    "last_error = ? WHERE id = ?",
+                    (attempts, time.time() + delay, str(error), entry["id"])
+                )
+
+    # Function to drain the journal until the process exits
+    def _run(self):
+        while True:
+            target, entries = self._next_batch()
+            if not entries:
+                self._wake.wait(timeout=self._seconds_until_due() or 5.0)
+                self._wake.clear()
+                continue
+
+            spreadsheet_id, sheet_title, kind = target
+            try:
+                with self._manager.lease() as service:
+                    written, rejected = flush_entries(service, spreadsheet_id, sheet_title, kind, entries)
+                for entry, error in rejected:
+                    self._mark_failed([entry["id"]], error)
+                self._mark_synced([entry["id"] for entry in written])
+            except PermanentWriteError as e:
+                self._mark_failed([entry["id"] for entry in entries], e)
+            except HttpError as e:
+                if e.resp.status in RETRYABLE_STATUSES:
+                    self._mark_retry(entries, e)
+                else:
+                    self._mark_failed([entry["id"] for entry in entries], e)
+            except Exception as e:  # Network errors, timeouts: keep the rows and retry later
+                self._mark_retry(entries, e)
+
+
+# Function to write a batch of journaled entries to one sheet in a single batchUpdate.
+# The write goes through the tab's write lock, and positions and duplicate checks use the
+# current sheet state from a range probe. Returns the written entries and (entry, reason)
+# pairs that were rejected.
+@traced("flush_entries")
+def flush_entries(service, spreadsheet_id, sheet_title, kind, entries):
+    def plan(snapshot):
+        headers, data, month_sections, total_rows = snapshot
+        # Looked up per attempt: a write rejected with a 400 drops the cached sheet IDs
+        sheet_id = get_sheet_id(service, spreadsheet_id, sheet_title)
+        if sheet_id is None:
+            raise RuntimeError("Could not retrieve sheet ID for formatting.")
+        written = []
+        rejected = []
+        color_requests, color_change = [], None
+        if kind == KIND_THEATER:
+            batch_nos = set()
+            for entry in entries:
+                if data.has_key(entry["row"][0]) or entry["row"][0] in batch_nos:
+                    rejected.append((entry, f"NO '{entry['row'][0]}' already exists."))
+                else:
+                    batch_nos.add(entry["row"][0])
+                    written.append(entry)
+            rows = [entry["row"] for entry in written]
+            index = month_sections.copy()
+            blocks = build_theater_import_blocks(sheet_id, headers, month_sections, total_rows, rows, index=index)
+            after = theater_snapshot_after(snapshot, index, rows, sum(inserted for _, _, inserted in blocks))
+        else:
+            written = entries
+            rows = [entry["row"] for entry in written]
+            blocks = build_video_call_import_blocks(sheet_id, total_rows, rows)
+            after = extend_video_call_snapshot(snapshot, rows)
+            # New or changed event colors go into the same batchUpdate as the rows
+            event_colors = {entry["row"][3]: entry["event_color"] for entry in entries if entry.get("event_color")}
+            color_requests, color_change = event_color_registry.plan(service, spreadsheet_id, sheet_title, event_colors)
+
+        requests = [request for block_requests, _, _ in blocks for request in block_requests]
+        if requests:
+            requests += color_requests
+        return requests, after, (written, rejected, color_change, len(color_requests) if requests else 0)
+
+    if kind == KIND_THEATER:
+        parse, extend = parse_theater_values, extend_theater_snapshot
+    else:
+        parse, extend = parse_video_call_values, extend_video_call_snapshot
+    try:
+        (written, rejected, color_change, color_count), result = sheet_writer.append(
+            service, spreadsheet_id, sheet_title, parse, extend, plan)
+    except ValueError as e:
+        raise PermanentWriteError(str(e))
+    except HttpError:
+        event_color_registry.invalidate(spreadsheet_id, sheet_title)
+        raise
+    if color_count:
+        event_color_registry.commit(color_change, result.get('replies', [])[-color_count:])
+    return written, rejected
+
+
+# Process-wide queue shared by every Streamlit session
+write_queue = WriteQueue()